@@ -1,5 +1,135 @@
+import json
+import time
+
 import streamlit as st
-from scraper import LookfantasticScraper, build_routine, build_hair_routine
+from cache import ProductCache
+from catalog import CatalogStore, DEFAULT_CATALOG_DIR
+from jobs import JobManager
+from resilience import AdaptiveTimeouts, CircuitBreaker
+from scheduler import HostScheduler
+from tracing import Tracer
+from scraper import (
+    Product, LookfantasticScraper, ScraperPool,
+    build_routine, build_hair_routine, build_skin_index, build_hair_index
+)
+
+CACHE_TTL = 6 * 3600  # durée de validité du cache produits (secondes)
+SCRAPER_WORKERS = 3   # navigateurs en parallèle pour les pages produits
+SCRAPER_POOL_SIZE = 2 # scrapers prêts, partagés par toutes les sessions
+CATALOG_DIR = DEFAULT_CATALOG_DIR  # catalogue publié par `python scraper.py refresh`
+POLL_INTERVAL = 0.5   # secondes entre deux rafraîchissements pendant une collecte
+LEASE_TIMEOUT = 120   # attente maximale d'un scraper libre (secondes)
+
+
+# Spans de tout le processus (scrapers, tâches, scoring) : panneau de debug
+@st.cache_resource
+def get_tracer():
+    return Tracer()
+
+
+# Délais appris et disjoncteurs communs à tous les scrapers du pool,
+# affichés dans le panneau de debug
+@st.cache_resource
+def get_timeouts():
+    return AdaptiveTimeouts()
+
+
+@st.cache_resource
+def get_breaker():
+    return CircuitBreaker()
+
+
+# Ressource unique pour tout le processus Streamlit : les navigateurs sont
+# lancés une seule fois puis prêtés à chaque génération de routine.
+@st.cache_resource
+def get_scraper_pool():
+    cache = ProductCache(ttl=CACHE_TTL)
+    # Un seul planificateur : le débit par hôte vaut pour toutes les sessions
+    scheduler = HostScheduler()
+    tracer = get_tracer()
+    timeouts = get_timeouts()
+    breaker = get_breaker()
+    return ScraperPool(
+        factory=lambda: LookfantasticScraper(
+            headless=True, cache=cache, workers=SCRAPER_WORKERS, scheduler=scheduler, tracer=tracer,
+            timeouts=timeouts, breaker=breaker
+        ),
+        size=SCRAPER_POOL_SIZE
+    )
+
+
+# Collectes en tâche de fond partagées par toutes les sessions : deux
+# utilisateurs qui demandent le même problème attendent la même tâche
+@st.cache_resource
+def get_job_manager():
+    return JobManager(workers=SCRAPER_POOL_SIZE, tracer=get_tracer())
+
+
+def scrape_job(pool, collect_name, concern_key):
+    def run(job):
+        with pool.leased(timeout=LEASE_TIMEOUT) as scraper:
+            return getattr(scraper, collect_name)(concern_key, on_page=job.report)
+    return run
+
+
+# Catalogue pré-calculé par le rafraîchisseur : une simple lecture, sans Chrome
+@st.cache_resource
+def get_catalog_store():
+    return CatalogStore(CATALOG_DIR)
+
+
+@st.cache_resource(max_entries=16)
+def load_catalog_index(kind, concern_key, version):
+    data = get_catalog_store().products(kind, concern_key, version)
+    products = [Product.from_dict(d) for d in data]
+    return build_index(kind, products)
+
+
+def build_index(kind, products):
+    with get_tracer().span("scoring", kind=kind, products=len(products)):
+        return build_skin_index(products) if kind == "skin" else build_hair_index(products)
+
+
+def catalog_index(kind, concern_key):
+    store = get_catalog_store()
+    version = store.current_version()
+    # Problème absent ou vide : scraping en direct plutôt que des produits par défaut
+    if version is None or not store.products(kind, concern_key, version):
+        return None
+    return load_catalog_index(kind, concern_key, version)
+
+
+def render_routine(routine, steps_labels, pending=()):
+    cols = st.columns(len(steps_labels))
+
+    for i, (step, label) in enumerate(steps_labels.items()):
+        p = routine.get(step)
+        with cols[i]:
+            st.subheader(label)
+            if step in pending:
+                st.caption("⏳ Recherche en cours…")
+            elif p:
+                st.write(f"**{p.name}**")
+                st.write(f"💶 Prix : {p.price}")
+                st.write(p.description[:200] + "...")
+                st.link_button("Voir le produit", p.url)
+            else:
+                st.error("Aucun produit trouvé")
+
+
+# Collecte en cours : la barre suit les pages visitées et une routine
+# provisoire est construite avec les produits déjà trouvés
+def render_job_progress(job, progress, provisional_routine, steps_labels):
+    if job.total:
+        progress.progress(job.done / job.total, text=f"🔍 {job.done}/{job.total} pages produits analysées")
+    else:
+        progress.progress(0, text="🔍 Lecture des catégories…")
+
+    products = job.products()
+    if products:
+        pending = set(steps_labels) - {p.category for p in products}
+        st.caption("Routine provisoire — affinée au fil de la recherche")
+        render_routine(provisional_routine(products), steps_labels, pending)
 
 # -----------------------------
 # 1. PAGE CONFIG
@@ -10,6 +140,14 @@ st.set_page_config(
     layout="wide"
 )
 
+# Pré-lancement des navigateurs dès l'ouverture de l'application (inutile
+# quand un catalogue est disponible)
+if get_catalog_store().current_version() is None:
+    get_scraper_pool()
+
+# Vrai tant qu'une collecte lancée par cette page n'est pas terminée
+jobs_pending = False
+
 # -----------------------------
 # 2. HEADER + WARNINGS
 # -----------------------------
@@ -53,38 +191,17 @@ st.divider()
 # -----------------------------
 # 4. LANCEMENT DU SCRAPING SKINCARE
 # -----------------------------
-if start:
-    st.header("🔍 Recherche des meilleurs produits pour toi…")
+skin_map = {"Sèche": "1", "Mixte": "2", "Grasse": "3", "Sensible": "4"}
+concern_map = {"Acné": "1", "Déshydratation": "2", "Anti‑âge": "3"}
 
-    skin_map = {"Sèche": "1", "Mixte": "2", "Grasse": "3", "Sensible": "4"}
-    concern_map = {"Acné": "1", "Déshydratation": "2", "Anti‑âge": "3"}
+# Une fois les produits récupérés pour ce problème, la routine reste affichée :
+# changer le type de peau ou le budget ne fait qu'interroger l'index de scores
+if start or st.session_state.get("shown_skin_key") == concern_map[concern]:
+    st.header("🔍 Recherche des meilleurs produits pour toi…")
 
     skin_key = skin_map[skin_type]
     concern_key = concern_map[concern]
 
-    progress = st.progress(0)
-
-    with st.spinner("Connexion à Lookfantastic…"):
-        scraper = LookfantasticScraper(headless=True)
-
-    with st.spinner("🔍 Recherche des produits…"):
-        if "products_skin" not in st.session_state or st.session_state.get("last_skin_key") != concern_key:
-            st.session_state.products_skin = scraper.collect_products_for_routine(concern_key)
-            st.session_state.last_skin_key = concern_key
-        products = st.session_state.products_skin
-        progress.progress(50)
-
-    with st.spinner("🧪 Analyse des produits…"):
-        routine = build_routine(products, concern_key, skin_key, budget)
-        progress.progress(100)
-
-    scraper.close()
-
-    st.success("✨ Routine générée avec succès !")
-    st.divider()
-
-    st.header("🌿 Ta routine skincare personnalisée")
-
     steps_labels = {
         "cleanser": "Nettoyant",
         "serum": "Sérum",
@@ -92,19 +209,47 @@ if start:
         "spf": "Protection solaire (SPF)"
     }
 
-    cols = st.columns(4)
+    progress = st.progress(0)
 
-    for i, (step, label) in enumerate(steps_labels.items()):
-        p = routine.get(step)
-        with cols[i]:
-            st.subheader(label)
-            if p:
-                st.write(f"**{p.name}**")
-                st.write(f"💶 Prix : {p.price}")
-                st.write(p.description[:200] + "...")
-                st.link_button("Voir le produit", p.url)
-            else:
-                st.error("Aucun produit trouvé")
+    skin_index = catalog_index("skin", concern_key)
+    if skin_index is None and st.session_state.get("last_skin_key") == concern_key:
+        skin_index = st.session_state.skin_index
+    st.session_state.shown_skin_key = concern_key
+
+    if skin_index is None:
+        with st.spinner("Connexion à Lookfantastic…"):
+            pool = get_scraper_pool()
+
+        # Le scraping tourne en fond : la page est redessinée toutes les
+        # POLL_INTERVAL secondes et reste réactive aux réglages
+        job = get_job_manager().submit(
+            ("skin", concern_key), scrape_job(pool, "collect_products_for_routine", concern_key)
+        )
+        if job.status == "done":
+            st.session_state.skin_index = skin_index = build_index("skin", job.result)
+            st.session_state.last_skin_key = concern_key
+        elif job.status == "error":
+            st.error(f"La recherche a échoué : {job.error}")
+            st.session_state.shown_skin_key = None
+        else:
+            render_job_progress(
+                job, progress,
+                lambda products: build_routine(products, concern_key, skin_key, budget),
+                steps_labels
+            )
+            jobs_pending = True
+
+    if skin_index is not None:
+        with st.spinner("🧪 Analyse des produits…"):
+            with get_tracer().span("routine.build", kind="skin"):
+                routine = skin_index.routine(concern_key, skin_key, budget)
+            progress.progress(100, text="✨ Analyse terminée")
+
+        st.success("✨ Routine générée avec succès !")
+        st.divider()
+
+        st.header("🌿 Ta routine skincare personnalisée")
+        render_routine(routine, steps_labels)
 
 # -----------------------------
 # 5. FORMULAIRE UTILISATEUR CHEVEUX
@@ -128,42 +273,19 @@ start_hair = st.button("💇‍♀️ Générer ma routine cheveux")
 # -----------------------------
 # 6. LANCEMENT DU SCRAPING CHEVEUX
 # -----------------------------
-if start_hair:
+hair_type_map = {"Fins": "1", "Épais": "2", "Bouclés": "3", "Crépus": "4"}
+hair_concern_map = {
+    "Cheveux secs": "1",
+    "Cheveux gras": "2",
+    "Chute / perte de densité": "3"
+}
+
+if start_hair or st.session_state.get("shown_hair_key") == hair_concern_map[hair_concern]:
     st.header("🔍 Recherche des meilleurs produits capillaires…")
 
-    hair_type_map = {"Fins": "1", "Épais": "2", "Bouclés": "3", "Crépus": "4"}
-    hair_concern_map = {
-        "Cheveux secs": "1",
-        "Cheveux gras": "2",
-        "Chute / perte de densité": "3"
-    }
-
     hair_type_key = hair_type_map[hair_type]
     hair_concern_key = hair_concern_map[hair_concern]
 
-    progress_hair = st.progress(0)
-
-    with st.spinner("Connexion à Lookfantastic…"):
-        scraper = LookfantasticScraper(headless=True)
-
-    with st.spinner("🔍 Recherche des produits cheveux…"):
-        if "products_hair" not in st.session_state or st.session_state.get("last_hair_key") != hair_concern_key:
-            st.session_state.products_hair = scraper.collect_hair_products(hair_concern_key)
-            st.session_state.last_hair_key = hair_concern_key
-        products_hair = st.session_state.products_hair
-        progress_hair.progress(50)
-
-    with st.spinner("🧪 Analyse des produits…"):
-        routine_hair = build_hair_routine(products_hair, hair_concern_key, hair_type_key, hair_budget)
-        progress_hair.progress(100)
-
-    scraper.close()
-
-    st.success("✨ Routine capillaire générée avec succès !")
-    st.divider()
-
-    st.header("💇‍♀️ Ta routine capillaire personnalisée")
-
     hair_steps_labels = {
         "shampoo": "Shampoing",
         "conditioner": "Après‑shampoing",
@@ -171,16 +293,85 @@ if start_hair:
         "hair_serum": "Sérum / Huile"
     }
 
-    cols_hair = st.columns(4)
+    progress_hair = st.progress(0)
 
-    for i, (step, label) in enumerate(hair_steps_labels.items()):
-        p = routine_hair.get(step)
-        with cols_hair[i]:
-            st.subheader(label)
-            if p:
-                st.write(f"**{p.name}**")
-                st.write(f"💶 Prix : {p.price}")
-                st.write(p.description[:200] + "...")
-                st.link_button("Voir le produit", p.url)
-            else:
-                st.error("Aucun produit trouvé")
\ No newline at end of file
+    hair_index = catalog_index("hair", hair_concern_key)
+    if hair_index is None and st.session_state.get("last_hair_key") == hair_concern_key:
+        hair_index = st.session_state.hair_index
+    st.session_state.shown_hair_key = hair_concern_key
+
+    if hair_index is None:
+        with st.spinner("Connexion à Lookfantastic…"):
+            pool = get_scraper_pool()
+
+        job = get_job_manager().submit(
+            ("hair", hair_concern_key), scrape_job(pool, "collect_hair_products", hair_concern_key)
+        )
+        if job.status == "done":
+            st.session_state.hair_index = hair_index = build_index("hair", job.result)
+            st.session_state.last_hair_key = hair_concern_key
+        elif job.status == "error":
+            st.error(f"La recherche a échoué : {job.error}")
+            st.session_state.shown_hair_key = None
+        else:
+            render_job_progress(
+                job, progress_hair,
+                lambda products: build_hair_routine(products, hair_concern_key, hair_type_key, hair_budget),
+                hair_steps_labels
+            )
+            jobs_pending = True
+
+    if hair_index is not None:
+        with st.spinner("🧪 Analyse des produits…"):
+            with get_tracer().span("routine.build", kind="hair"):
+                routine_hair = hair_index.routine(hair_concern_key, hair_type_key, hair_budget)
+            progress_hair.progress(100, text="✨ Analyse terminée")
+
+        st.success("✨ Routine capillaire générée avec succès !")
+        st.divider()
+
+        st.header("💇‍♀️ Ta routine capillaire personnalisée")
+        render_routine(routine_hair, hair_steps_labels)
+
+# -----------------------------
+# 7. PANNEAU DE DEBUG (OPTIONNEL)
+# -----------------------------
+if st.sidebar.checkbox("🛠️ Mode debug"):
+    tracer = get_tracer()
+    st.sidebar.subheader("Temps par étape")
+    summary = tracer.summary()
+    if summary:
+        st.sidebar.dataframe([{"étape": name, **stats} for name, stats in summary.items()], hide_index=True)
+    else:
+        st.sidebar.caption("Aucun span enregistré.")
+
+    st.sidebar.subheader("Délais appris")
+    learned = get_timeouts().report()
+    if learned:
+        st.sidebar.dataframe([{"sélecteur": key, **r} for key, r in learned.items()], hide_index=True)
+    else:
+        st.sidebar.caption("Pas encore de mesure : délai par défaut.")
+    opened = get_breaker().open_circuits()
+    if opened:
+        st.sidebar.warning("Circuits ouverts : " + ", ".join(opened))
+
+    errors = tracer.errors()
+    st.sidebar.subheader(f"Erreurs ({len(errors)})")
+    for span in errors[-10:]:
+        st.sidebar.caption(span["attributes"].get("message") or f'{span["name"]} : {span["attributes"].get("error")}')
+
+    st.sidebar.download_button("Exporter (JSON lines)", tracer.to_jsonl(), "trace.jsonl", "application/jsonl")
+    st.sidebar.download_button(
+        "Exporter (OpenTelemetry)", json.dumps(tracer.to_otlp()), "trace-otlp.json", "application/json"
+    )
+    if st.sidebar.button("Vider la trace"):
+        tracer.clear()
+
+# -----------------------------
+# 8. SUIVI DES COLLECTES EN COURS
+# -----------------------------
+# Le script se termine aussitôt ; il est relancé régulièrement tant qu'une
+# tâche tourne (un réglage modifié entre-temps relance simplement la page)
+if jobs_pending:
+    time.sleep(POLL_INTERVAL)
+    st.rerun()
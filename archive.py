@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+from fetchers import parse_listing_html, parse_product_html
+from sqlite_shared import connect_shared, immediate_transaction
+from tracing import Tracer
+
+# ============================================================
+# ---------------   ARCHIVE DES PAGES (WARC COMPRESSÉ)   ---------------
+# ============================================================
+# Chaque liste et page produit récupérée peut être ajoutée à une archive
+# en ajout seul : un enregistrement WARC « resource » par page, compressé
+# en gzip indépendant (comme un .warc.gz), avec un index SQLite à côté
+# (URL, type, position, taille). Une page identique à sa dernière version
+# n'est pas réécrite.
+# Le rejeu lit l'archive par mmap et relance l'extraction et le scoring
+# sans navigateur ni réseau : changer detect_category, les motifs des
+# problèmes ou la troncature des descriptions ne demande plus de recrawl.
+
+DEFAULT_ARCHIVE_PATH = "snapshots.warc.gz"
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_url ON records (url, kind, id);
+"""
+
+
+def _warc_record(url, kind, body, fetched_at):
+    date = datetime.fromtimestamp(fetched_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    header = (
+        "WARC/1.1\r\n"
+        "WARC-Type: resource\r\n"
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+        f"WARC-Target-URI: {url}\r\n"
+        f"WARC-Date: {date}\r\n"
+        f"X-Snapshot-Kind: {kind}\r\n"
+        "Content-Type: text/html; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "\r\n"
+    ).encode("utf-8")
+    return gzip.compress(header + body + b"\r\n\r\n", compresslevel=6)
+
+
+def _warc_body(record):
+    header, _, rest = record.partition(b"\r\n\r\n")
+    for line in header.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            return rest[:int(value)]
+    return rest
+
+
+class SnapshotArchive:
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH, tracer=None):
+        self.path = path
+        self.tracer = tracer or Tracer()
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        self._map = None
+        self._conn = connect_shared(path + ".idx")
+        self._conn.executescript(INDEX_SCHEMA)
+
+    # -----------------------------
+    # Écriture
+    # -----------------------------
+    def put(self, url, kind, text):
+        # Une erreur d'archivage ne doit pas interrompre le scraping
+        body = text.encode("utf-8")
+        digest = hashlib.sha1(body).hexdigest()
+        try:
+            # Le verrou d'écriture de l'index sérialise aussi les ajouts au
+            # fichier entre processus : la position lue reste exacte
+            with immediate_transaction(self._conn, self._lock) as conn:
+                row = conn.execute(
+                    "SELECT digest FROM records WHERE url = ? AND kind = ? ORDER BY id DESC LIMIT 1", (url, kind)
+                ).fetchone()
+                if row and row[0] == digest:
+                    return False
+
+                fetched_at = time.time()
+                record = _warc_record(url, kind, body, fetched_at)
+                self._file.seek(0, os.SEEK_END)
+                position = self._file.tell()
+                self._file.write(record)
+                self._file.flush()
+                conn.execute(
+                    "INSERT INTO records (url, kind, position, size, digest, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, kind, position, len(record), digest, fetched_at)
+                )
+            return True
+        except (OSError, sqlite3.Error) as e:
+            self.tracer.error(f"Erreur d'archivage ({url}) : {e}", url)
+            return False
+
+    # -----------------------------
+    # Lecture
+    # -----------------------------
+    def latest(self):
+        # Index en mémoire : (kind, url) → (position, taille) de la dernière version
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, url, position, size FROM records WHERE id IN "
+                "(SELECT MAX(id) FROM records GROUP BY url, kind)"
+            ).fetchall()
+        return {(kind, url): (position, size) for kind, url, position, size in rows}
+
+    def read(self, position, size):
+        with self._lock:
+            # Archive agrandie depuis la dernière projection : on la refait
+            if self._map is None or position + size > len(self._map):
+                if self._map is not None:
+                    self._map.close()
+                self._file.flush()
+                with open(self.path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            record = self._map[position:position + size]
+        return _warc_body(zlib.decompress(record, wbits=31)).decode("utf-8")
+
+    def get(self, url, kind):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT position, size FROM records WHERE url = ? AND kind = ? ORDER BY id DESC LIMIT 1", (url, kind)
+            ).fetchone()
+        return self.read(*row) if row else None
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, COUNT(*), COUNT(DISTINCT url), SUM(size) FROM records GROUP BY kind"
+            ).fetchall()
+        return {kind: {"records": records, "urls": urls, "bytes": size} for kind, records, urls, size in rows}
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+            self._conn.close()
+
+
+# -----------------------------
+# Backend de rejeu
+# -----------------------------
+# Même interface que HttpFetcher (fetch_listing / fetch_product) : passé
+# comme `backend` à LookfantasticScraper, il sert les pages depuis la
+# dernière version archivée. Page absente : None, comme un échec HTTP.
+class ArchiveReplay:
+    def __init__(self, archive, tracer=None):
+        self.archive = archive
+        self.tracer = tracer or Tracer()
+        self.index = archive.latest()
+
+    def _text(self, kind, url):
+        entry = self.index.get((kind, url))
+        if entry is None:
+            return None
+        with self.tracer.span("archive.read", url, kind=kind, size=entry[1]):
+            return self.archive.read(*entry)
+
+    def fetch_listing(self, url):
+        text = self._text("listing", url)
+        if text is None:
+            return None
+        with self.tracer.span("extract.listing", url, backend="replay") as span:
+            tiles = parse_listing_html(text, url)
+            span["tiles"] = len(tiles)
+        return tiles or None
+
+    def fetch_product(self, url):
+        text = self._text("product", url)
+        if text is None:
+            return None
+        with self.tracer.span("extract.product", url, backend="replay") as span:
+            fields = parse_product_html(text)
+            span["found"] = fields is not None
+        return fields
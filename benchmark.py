@@ -0,0 +1,437 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import WebDriverException
+
+from archive import SnapshotArchive
+from scheduler import HostScheduler
+from scraper import (
+    LookfantasticScraper, Product, rule_keywords,
+    SKIN_CATEGORY_RULES, SKIN_CONCERN_RULES, SKIN_TYPE_RULES,
+    HAIR_CATEGORY_RULES, HAIR_CONCERN_RULES, HAIR_TYPE_RULES,
+    build_routine, build_hair_routine, build_skin_index, build_hair_index
+)
+
+# ============================================================
+# ---------------   BENCHMARK HORS LIGNE   ---------------
+# ============================================================
+# Un faux Lookfantastic local sert des listes et des pages produits
+# générées (latence et taux d'erreur réglables). On y mesure le scraping
+# HTTP, les collecteurs et la construction des routines pour plusieurs
+# tailles de catalogue, sans navigateur ni accès réseau.
+#
+#   python benchmark.py --sizes 50,200,1000 --latency 0.02 --error-rate 0.05
+#
+# Avec --recorded, le faux site sert des pages enregistrées du vrai site
+# (dossier miroir ou archive SnapshotArchive) : une régression face au
+# balisage réel de Lookfantastic apparaît dans les erreurs.
+#
+#   python benchmark.py --recorded snapshots.warc.gz
+#
+# Résultat : un JSON (pages/s, latences p50/p95, débit de scoring, pic RSS).
+
+# -----------------------------
+# 1. Catalogue synthétique
+# -----------------------------
+# Vocabulaire tiré des règles de scoring et des motifs de problèmes : les
+# produits générés déclenchent les mêmes chemins que de vraies pages
+VOCABULARY = sorted(set(
+    [word for _, words in SKIN_CATEGORY_RULES + HAIR_CATEGORY_RULES for word in words]
+    + rule_keywords(SKIN_CONCERN_RULES, SKIN_TYPE_RULES, HAIR_CONCERN_RULES, HAIR_TYPE_RULES)
+    + [word for _, pattern, _ in LookfantasticScraper.CONCERNS.values() for word in pattern.split("|")]
+))
+FILLER = ("formule", "texture", "légère", "quotidien", "visage", "cheveux", "flacon", "application")
+
+
+def synthetic_fields(product_id, seed=0):
+    rng = random.Random(f"{seed}-{product_id}")
+    words = rng.sample(VOCABULARY, 3)
+    description = " ".join(rng.sample(VOCABULARY, 4) + [rng.choice(FILLER) for _ in range(40)])
+    return {
+        "name": f"Produit {product_id} " + " ".join(words),
+        "price": f"{rng.randint(5, 90)},{rng.randint(0, 99):02d} €",
+        "description": description
+    }
+
+
+def synthetic_products(count, steps, seed=0):
+    products = []
+    for i in range(count):
+        fields = synthetic_fields(i, seed)
+        products.append(Product(
+            name=fields["name"],
+            price=fields["price"],
+            url=f"https://example.invalid/p/{i}.html",
+            description=fields["description"][:600],
+            concern="Benchmark",
+            category=steps[i % len(steps)]
+        ))
+    return products
+
+# -----------------------------
+# 2. Faux site local
+# -----------------------------
+# Origine des URL enregistrées, remplacée par celle du faux site
+SITE_ORIGIN = "https://www.lookfantastic.fr"
+
+
+def _path_key(url):
+    parsed = urlparse(url)
+    return parsed.path + (f"?{parsed.query}" if parsed.query else "")
+
+
+# Pages du vrai site retrouvées par chemin d'URL : dossier miroir
+# (wget -x : <chemin>/index.html, <chemin>.html) ou archive des pages
+class RecordedPages:
+    def __init__(self, source):
+        self.directory = None
+        self.archive = None
+        self.entries = {}
+        if os.path.isdir(source):
+            self.directory = os.path.abspath(source)
+        else:
+            self.archive = SnapshotArchive(source)
+            for (kind, url), entry in self.archive.latest().items():
+                self.entries[_path_key(url)] = (kind, entry)
+
+    def product_paths(self):
+        # Chemins des pages produits connues (archive seulement)
+        return [path for path, (kind, _) in self.entries.items() if kind == "product"]
+
+    def page(self, path):
+        if self.archive:
+            found = self.entries.get(path)
+            return self.archive.read(*found[1]) if found else None
+
+        relative = path.split("?")[0].lstrip("/")
+        candidates = [os.path.join(relative, "index.html"), relative, relative.rstrip("/") + ".html"]
+        for candidate in candidates:
+            full = os.path.abspath(os.path.join(self.directory, candidate))
+            # Pas de sortie du dossier par « .. »
+            if full.startswith(self.directory + os.sep) and os.path.isfile(full):
+                with open(full, encoding="utf-8", errors="replace") as f:
+                    return f.read()
+        return None
+
+    def close(self):
+        if self.archive:
+            self.archive.close()
+
+
+class StandInSite:
+    def __init__(self, size, latency=0.0, error_rate=0.0, seed=0, structured=False, recorded=None):
+        self.size = size              # produits par liste
+        self.latency = latency        # secondes ajoutées à chaque réponse
+        self.error_rate = error_rate  # part des réponses en erreur 500
+        self.seed = seed
+        self.structured = structured  # pages produits avec JSON-LD schema.org
+        self.recorded = recorded      # RecordedPages : pages réelles au lieu des pages générées
+        self.hits = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def url(self, path):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{path}"
+
+    def category_url(self, step, real_url):
+        # Pages enregistrées : chemin réel de la catégorie ; sinon /c/<étape>/
+        return self.url(_path_key(real_url) if self.recorded else f"/c/{step}/")
+
+    def listing_html(self, name):
+        # Les listes se recouvrent (pool de 2 x size produits) comme sur le vrai site
+        rng = random.Random(f"{self.seed}-{name}")
+        ids = rng.sample(range(self.size * 2), self.size)
+        tiles = []
+        for product_id in ids:
+            fields = synthetic_fields(product_id, self.seed)
+            tiles.append(
+                f'<div class="product-data"><a class="product-item-title" href="/p/{product_id}.html">'
+                f'{escape(fields["name"])}</a><span class="price">{escape(fields["price"])}</span></div>'
+            )
+        return f"<html><body>{''.join(tiles)}</body></html>"
+
+    def product_html(self, product_id):
+        fields = synthetic_fields(product_id, self.seed)
+        head = ""
+        if self.structured:
+            data = {
+                "@context": "https://schema.org",
+                "@type": "Product",
+                "name": fields["name"],
+                "description": fields["description"],
+                "offers": {
+                    "@type": "Offer",
+                    "price": fields["price"].split()[0].replace(",", "."),
+                    "priceCurrency": "EUR"
+                }
+            }
+            head = f'<head><script type="application/ld+json">{json.dumps(data, ensure_ascii=False)}</script></head>'
+        return (
+            f'<html>{head}<body><h1 id="product-title">{escape(fields["name"])}</h1>'
+            f'<span class="text-gray-900">{escape(fields["price"])}</span>'
+            f'<div id="product-description-0"><p>{escape(fields["description"])}</p></div></body></html>'
+        )
+
+    def respond(self, path):
+        with self._lock:
+            self.hits += 1
+            failed = self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            return 500, None
+        if self.recorded:
+            text = self.recorded.page(path)
+            if text is None:
+                return 404, None
+            # Liens absolus vers le vrai site ramenés sur le faux
+            return 200, text.replace(SITE_ORIGIN, self.url("").rstrip("/"))
+        if path.startswith("/c/"):
+            return 200, self.listing_html(path.strip("/"))
+        if path.startswith("/p/") and path.endswith(".html"):
+            try:
+                return 200, self.product_html(int(path[3:-5]))
+            except ValueError:
+                pass
+        return 404, None
+
+    def start(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = site.respond(self.path)
+                payload = (body or "").encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# Scraper pointé sur le faux site. Sans navigateur, une page que le backend
+# HTTP ne sait pas lire compte comme une erreur (pas de repli Selenium).
+class OfflineScraper(LookfantasticScraper):
+    def __init__(self, site, workers=1):
+        # Débit illimité : on mesure le scraper, pas la politesse
+        super().__init__(headless=True, workers=workers, scheduler=HostScheduler(max_rate=1e6, burst=1e6))
+        self.CATEGORY_URLS = {
+            step: site.category_url(step, url) for step, url in LookfantasticScraper.CATEGORY_URLS.items()
+        }
+        self.HAIR_CATEGORY_URLS = {
+            step: site.category_url(step, url) for step, url in LookfantasticScraper.HAIR_CATEGORY_URLS.items()
+        }
+
+    def _selenium_listing(self, url):
+        raise WebDriverException(f"Pas de navigateur en benchmark ({url})")
+
+    def _selenium_product_fields(self, link):
+        raise WebDriverException(f"Pas de navigateur en benchmark ({link})")
+
+# -----------------------------
+# 3. Mesures
+# -----------------------------
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def latency_stats(durations, errors, elapsed):
+    return {
+        "calls": len(durations) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(durations, 0.50) * 1000, 2) if durations else None,
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 2) if durations else None,
+        "pages_per_s": round((len(durations) + errors) / elapsed, 1) if elapsed else None
+    }
+
+
+def time_calls(func, calls):
+    durations, errors = [], 0
+    start = time.perf_counter()
+    for args in calls:
+        t = time.perf_counter()
+        try:
+            func(*args)
+        except Exception:
+            errors += 1
+            continue
+        durations.append(time.perf_counter() - t)
+    return latency_stats(durations, errors, time.perf_counter() - start)
+
+
+def time_collector(site, collect, concern_keys):
+    hits = site.hits
+    start = time.perf_counter()
+    products = 0
+    for concern_key in concern_keys:
+        products += len(collect(concern_key))
+    elapsed = time.perf_counter() - start
+    pages = site.hits - hits
+    return {
+        "runs": len(concern_keys),
+        "requests": pages,
+        "products": products,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(pages / elapsed, 1) if elapsed else None
+    }
+
+
+def time_scoring(build, build_index, products, concerns, types):
+    profiles = [(c, t, 25) for c in concerns for t in types]
+
+    start = time.perf_counter()
+    for profile in profiles:
+        build(products, *profile)
+    naive = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = build_index(products)
+    index_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for profile in profiles:
+        index.routine(*profile)
+    index_query = time.perf_counter() - start
+
+    return {
+        "products": len(products),
+        "profiles": len(profiles),
+        "routine_products_per_s": round(len(products) * len(profiles) / naive) if naive else None,
+        "index_build_s": round(index_build, 4),
+        "index_routines_per_s": round(len(profiles) / index_query, 1) if index_query else None
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def sample_pages(site, scraper, size, samples):
+    if not site.recorded:
+        return [site.url(f"/p/{product_id}.html") for product_id in range(min(samples, size * 2))]
+    paths = site.recorded.product_paths()
+    if paths:
+        return [site.url(path) for path in paths[:samples]]
+    # Dossier miroir : pages produits tirées des listes enregistrées
+    links = []
+    for url in scraper.CATEGORY_URLS.values():
+        links.extend(tile["href"] for tile in scraper.fetcher.fetch_listing(url) or [])
+    return list(dict.fromkeys(links))[:samples]
+
+
+def bench_size(size, latency=0.0, error_rate=0.0, workers=1, samples=50, seed=0, structured=False, recorded=None):
+    site = StandInSite(size, latency, error_rate, seed, structured, recorded).start()
+    scraper = OfflineScraper(site, workers)
+    try:
+        concern_name, pattern, _ = scraper.CONCERNS["1"]
+        listing_calls = [(url, "1", step) for step, url in scraper.CATEGORY_URLS.items()]
+        page_calls = [
+            (link, concern_name, pattern, "mask") for link in sample_pages(site, scraper, size, samples)
+        ]
+
+        result = {
+            "catalog_size": size,
+            "scrape_category": time_calls(scraper._scrape_category, listing_calls),
+            "scrape_product_page": time_calls(scraper._scrape_product_page, page_calls),
+            "collect_products_for_routine": time_collector(
+                site, scraper.collect_products_for_routine, list(scraper.CONCERNS)
+            ),
+            "collect_hair_products": time_collector(
+                site, scraper.collect_hair_products, list(scraper.HAIR_CONCERNS)
+            ),
+            "build_routine": time_scoring(
+                build_routine, build_skin_index,
+                synthetic_products(size, list(LookfantasticScraper.CATEGORY_URLS), seed),
+                list(SKIN_CONCERN_RULES), list(SKIN_TYPE_RULES)
+            ),
+            "build_hair_routine": time_scoring(
+                build_hair_routine, build_hair_index,
+                synthetic_products(size, list(LookfantasticScraper.HAIR_CATEGORY_URLS), seed),
+                list(HAIR_CONCERN_RULES), list(HAIR_TYPE_RULES)
+            )
+        }
+    finally:
+        scraper.close()
+        site.stop()
+
+    # Pic du processus depuis son lancement (cumulatif entre les tailles)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+# -----------------------------
+# 4. Programme principal
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne du scraper et du scoring")
+    parser.add_argument("--sizes", default="50,200,1000", help="produits par liste, séparés par des virgules")
+    parser.add_argument("--latency", type=float, default=0.0, help="latence ajoutée par réponse (secondes)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part des réponses en erreur 500")
+    parser.add_argument("--workers", type=int, default=1, help="pages récupérées en parallèle")
+    parser.add_argument("--samples", type=int, default=50, help="pages produits mesurées une à une")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--structured", action="store_true", help="pages produits avec données JSON-LD")
+    parser.add_argument("--recorded", help="pages réelles servies : dossier miroir ou archive .warc.gz")
+    parser.add_argument("--output", help="fichier JSON (sortie standard par défaut)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "settings": {
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "workers": args.workers,
+            "samples": args.samples,
+            "seed": args.seed,
+            "structured": args.structured,
+            "recorded": args.recorded
+        }
+    }
+
+    # Pages enregistrées : --sizes ne règle plus que le catalogue du scoring
+    recorded = RecordedPages(args.recorded) if args.recorded else None
+    try:
+        report["results"] = [
+            bench_size(int(size), args.latency, args.error_rate, args.workers, args.samples, args.seed,
+                       args.structured, recorded)
+            for size in args.sizes.split(",")
+        ]
+    finally:
+        if recorded:
+            recorded.close()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# ============================================================
+# ---------------   CACHE PERSISTANT (SQLITE)   ---------------
+# ============================================================
+# Les pages produits et les listes de catégories sont stockées par URL,
+# avec la date de récupération. Une entrée plus vieille que le TTL est
+# considérée comme périmée et la page est re-scrapée.
+
+DEFAULT_CACHE_PATH = "products_cache.sqlite3"
+DEFAULT_TTL = 24 * 3600  # secondes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    price TEXT NOT NULL,
+    description TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listings (
+    url TEXT PRIMARY KEY,
+    tiles TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listing_links (
+    listing_url TEXT NOT NULL,
+    link TEXT NOT NULL,
+    tile_hash TEXT NOT NULL,
+    PRIMARY KEY (listing_url, link)
+);
+"""
+
+# Colonnes ajoutées pour le re-crawl incrémental (bases existantes)
+MIGRATIONS = {
+    "pages": {"content_hash": "TEXT", "removed_at": "REAL"},
+    "listings": {"fingerprint": "TEXT"},
+}
+
+
+def _digest(*parts):
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def page_hash(fields):
+    return _digest(fields["name"], fields["price"], fields["description"])
+
+
+def tile_hash(tile):
+    return _digest(tile.get("title", ""), tile.get("price", ""))
+
+
+def listing_fingerprint(links):
+    return _digest(*links)
+
+
+class ProductCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        # ttl=None : les entrées n'expirent jamais
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        with self._conn:
+            for table, columns in MIGRATIONS.items():
+                existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for column, kind in columns.items():
+                    if column not in existing:
+                        self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+    def _is_fresh(self, fetched_at):
+        return self.ttl is None or time.time() - fetched_at <= self.ttl
+
+    # -----------------------------
+    # Pages produits
+    # -----------------------------
+    def get_page(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, price, description, fetched_at FROM pages "
+                "WHERE url = ? AND removed_at IS NULL", (url,)
+            ).fetchone()
+        if row is None or not self._is_fresh(row[3]):
+            return None
+        return {"name": row[0], "price": row[1], "description": row[2]}
+
+    def put_page(self, url, fields):
+        # Renvoie True si le contenu a changé depuis la dernière visite
+        content_hash = page_hash(fields)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, name, price, description, fetched_at, content_hash, removed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                (url, fields["name"], fields["price"], fields["description"], time.time(), content_hash)
+            )
+        return row is None or row[0] != content_hash
+
+    # -----------------------------
+    # Listes de catégories
+    # -----------------------------
+    def get_listing(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tiles, fetched_at FROM listings WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or not self._is_fresh(row[1]):
+            return None
+        return json.loads(row[0])
+
+    def put_listing(self, url, tiles):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO listings (url, tiles, fetched_at) VALUES (?, ?, ?)",
+                (url, json.dumps(tiles, ensure_ascii=False), time.time())
+            )
+
+    # -----------------------------
+    # Re-crawl incrémental
+    # -----------------------------
+    def sync_listing(self, url, tiles):
+        # Enregistre la nouvelle version d'une liste et la compare à la
+        # précédente. Renvoie (liste inchangée ?, liens nouveaux ou dont la
+        # vignette a changé, nombre de pages marquées retirées).
+        links = list(dict.fromkeys(t["href"] for t in tiles))
+        hashes = {}
+        for t in tiles:
+            hashes.setdefault(t["href"], tile_hash(t))
+        fingerprint = listing_fingerprint(links)
+
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT fingerprint FROM listings WHERE url = ?", (url,)).fetchone()
+            previous = dict(self._conn.execute(
+                "SELECT link, tile_hash FROM listing_links WHERE listing_url = ?", (url,)
+            ).fetchall())
+
+            # Première synchronisation : rien à comparer, le TTL s'applique
+            changed = [link for link in links if previous.get(link) != hashes[link]] if row else []
+            removed = [link for link in previous if link not in hashes]
+            unchanged = row is not None and row[0] == fingerprint and not changed
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO listings (url, tiles, fetched_at, fingerprint) VALUES (?, ?, ?, ?)",
+                (url, json.dumps(tiles, ensure_ascii=False), time.time(), fingerprint)
+            )
+            self._conn.execute("DELETE FROM listing_links WHERE listing_url = ?", (url,))
+            self._conn.executemany(
+                "INSERT INTO listing_links (listing_url, link, tile_hash) VALUES (?, ?, ?)",
+                [(url, link, hashes[link]) for link in links]
+            )
+
+            # Pierre tombale : produit absent de toutes les listes connues
+            now = time.time()
+            tombstoned = 0
+            for link in removed:
+                tombstoned += self._conn.execute(
+                    "UPDATE pages SET removed_at = ? WHERE url = ? AND removed_at IS NULL "
+                    "AND NOT EXISTS (SELECT 1 FROM listing_links WHERE link = ?)",
+                    (now, link, link)
+                ).rowcount
+
+        return unchanged, changed, tombstoned
+
+    # -----------------------------
+    # Maintenance
+    # -----------------------------
+    def purge_expired(self):
+        # Listes périmées avec leurs liens, puis pages périmées qu'aucune
+        # liste ne référence plus : celles encore listées gardent leur
+        # empreinte pour la prochaine revalidation
+        if self.ttl is None:
+            return
+        limit = time.time() - self.ttl
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM listing_links WHERE listing_url IN (SELECT url FROM listings WHERE fetched_at < ?)",
+                (limit,)
+            )
+            self._conn.execute("DELETE FROM listings WHERE fetched_at < ?", (limit,))
+            self._conn.execute(
+                "DELETE FROM pages WHERE fetched_at < ? "
+                "AND NOT EXISTS (SELECT 1 FROM listing_links WHERE link = pages.url)",
+                (limit,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
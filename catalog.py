@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+
+# ============================================================
+# ---------------   CATALOGUE LOCAL VERSIONNÉ   ---------------
+# ============================================================
+# Le rafraîchisseur (scraper.py refresh) écrit chaque catalogue complet
+# dans un nouveau fichier catalog-<version>.json, puis bascule le pointeur
+# CURRENT par un os.replace atomique : un lecteur voit toujours soit
+# l'ancienne version complète, soit la nouvelle.
+
+DEFAULT_CATALOG_DIR = "catalog"
+
+
+class CatalogStore:
+    def __init__(self, directory=DEFAULT_CATALOG_DIR, keep=3):
+        self.directory = directory
+        self.keep = keep  # nombre de versions conservées sur disque
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self._loaded = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _atomic_write(self, name, text):
+        tmp = self._path(name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(name))
+
+    # -----------------------------
+    # Écriture
+    # -----------------------------
+    def publish(self, data):
+        # Problème resté vide (crawl en échec) : les produits de la version
+        # précédente sont repris. Aucun produit nouveau : rien n'est publié
+        # et CURRENT reste sur la dernière bonne version.
+        previous = self.load() or {}
+        merged, fresh = {}, 0
+        for kind, concerns in data.items():
+            merged[kind] = {}
+            for concern_key, products in concerns.items():
+                if products:
+                    merged[kind][concern_key] = products
+                    fresh += 1
+                elif previous.get(kind, {}).get(concern_key):
+                    merged[kind][concern_key] = previous[kind][concern_key]
+        if not fresh:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        # Heure UTC : pas de retour en arrière au changement d'heure, l'ordre
+        # alphabétique des versions reste l'ordre chronologique
+        version = time.strftime("%Y%m%d-%H%M%S", time.gmtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        data = dict(merged, version=version, created_at=now)
+
+        self._atomic_write(f"catalog-{version}.json", json.dumps(data, ensure_ascii=False))
+        self._atomic_write("CURRENT", version)
+        self._prune()
+        return version
+
+    def _prune(self):
+        versions = self.versions()
+        current = self.current_version()
+        for version in versions[:-self.keep]:
+            if version == current:
+                continue
+            try:
+                os.remove(self._path(f"catalog-{version}.json"))
+            except OSError:
+                pass
+
+    # -----------------------------
+    # Lecture
+    # -----------------------------
+    def versions(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[len("catalog-"):-len(".json")]
+            for name in os.listdir(self.directory)
+            if name.startswith("catalog-") and name.endswith(".json")
+        )
+
+    def current_version(self):
+        try:
+            with open(self._path("CURRENT"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def load(self, version=None):
+        version = version or self.current_version()
+        if version is None:
+            return None
+        with self._lock:
+            if version != self._loaded_version:
+                try:
+                    with open(self._path(f"catalog-{version}.json"), encoding="utf-8") as f:
+                        self._loaded = json.load(f)
+                except (OSError, ValueError):
+                    return None
+                self._loaded_version = version
+            return self._loaded
+
+    def products(self, kind, concern_key, version=None):
+        # Produits (dictionnaires) d'un problème : kind = "skin" ou "hair"
+        data = self.load(version)
+        if data is None:
+            return None
+        return data.get(kind, {}).get(concern_key)
@@ -0,0 +1,249 @@
+import json
+import time
+from urllib.parse import urljoin
+
+import requests
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+
+from tracing import Tracer
+
+# ============================================================
+# ---------------   BACKEND HTTP (REQUESTS + LXML)   ---------------
+# ============================================================
+# Les champs utiles (titre, prix, description, liens des catégories) sont
+# présents dans le HTML statique de la plupart des pages : on les lit avec
+# une simple requête HTTP, sans lancer de navigateur. Quand un champ manque,
+# le fetcher renvoie None et le scraper repasse par Selenium.
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Équivalents XPath des sélecteurs CSS utilisés avec Selenium
+LISTING_TILE_XPATH = f"//div[{_has_class('product-data')}]"
+LISTING_LINK_XPATH = f".//a[{_has_class('product-item-title')}]"
+LISTING_PRICE_XPATH = ".//*[contains(@class, 'price')]"
+TITLE_XPATH = "//h1[@id='product-title']"
+PRICE_XPATH = f"//span[{_has_class('text-gray-900')}]"
+DESCRIPTION_XPATH = "//div[@id='product-description-0']"
+# Données structurées : JSON-LD schema.org et état produit sérialisé
+STRUCTURED_XPATH = "//script[@type='application/ld+json' or @id='__NEXT_DATA__']"
+
+
+def _clean_text(el):
+    # Espace entre les blocs (<p>, <li>…) comme le texte rendu par Selenium
+    return " ".join(" ".join(el.itertext()).split())
+
+
+def _first_text(tree, xpath):
+    found = tree.xpath(xpath)
+    return _clean_text(found[0]) if found else None
+
+
+def parse_listing_html(text, base_url):
+    tree = lxml_html.fromstring(text)
+    tiles = []
+    for el in tree.xpath(LISTING_TILE_XPATH):
+        links = el.xpath(LISTING_LINK_XPATH)
+        href = links[0].get("href") if links else None
+        if href:
+            tiles.append({
+                "href": urljoin(base_url, href),
+                "title": _clean_text(links[0]),
+                "price": _first_text(el, LISTING_PRICE_XPATH) or "",
+                "text": _clean_text(el)
+            })
+    return tiles
+
+
+# -----------------------------
+# Données structurées (JSON-LD / état embarqué)
+# -----------------------------
+# Les pages produits embarquent le nom, le prix (nombre + devise) et la
+# description en JSON : une seule lecture, sans attendre le rendu du DOM.
+def _json_nodes(data):
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def _is_typed_product(node):
+    kinds = node.get("@type")
+    kinds = kinds if isinstance(kinds, list) else [kinds]
+    return "Product" in kinds
+
+
+def _offer_price(node):
+    offer = node.get("offers", node)
+    if isinstance(offer, list):
+        offer = offer[0] if offer else {}
+    if not isinstance(offer, dict):
+        return None, None
+
+    price = offer.get("price", offer.get("lowPrice"))
+    currency = offer.get("priceCurrency") or offer.get("currency")
+    if isinstance(price, dict):
+        # État embarqué : {"amount": 12.99, "currency": "EUR"}
+        currency = currency or price.get("currency") or price.get("currencyCode")
+        price = price.get("amount", price.get("value"))
+    try:
+        return float(str(price).replace(",", ".")), currency or "EUR"
+    except (TypeError, ValueError):
+        return None, None
+
+
+def format_price(amount, currency="EUR"):
+    text = f"{amount:.2f}".replace(".", ",")
+    return f"{text} €" if currency in ("EUR", "€") else f"{text} {currency}"
+
+
+def _plain_text(value):
+    # Description JSON parfois en HTML : texte seul, espaces normalisés
+    if not isinstance(value, str) or not value.strip():
+        return ""
+    return _clean_text(lxml_html.fromstring(f"<div>{value}</div>"))
+
+
+def _structured_fields(node):
+    amount, currency = _offer_price(node)
+    name = node.get("name")
+    if not isinstance(name, str) or not name.strip() or amount is None:
+        return None
+    return {
+        "name": " ".join(name.split()),
+        "price": format_price(amount, currency),
+        "price_amount": amount,
+        "currency": currency,
+        "description": _plain_text(node.get("description"))
+    }
+
+
+def structured_product(payloads, page_name=None):
+    # payloads : contenus texte des balises <script> JSON de la page.
+    # Seuls les nœuds @type Product comptent, sauf celui qui porte le nom
+    # affiché de la page (page_name, titre h1) : il désigne le produit de la
+    # page parmi les recommandations, y compris dans un état embarqué.
+    page_name = " ".join(page_name.split()).casefold() if page_name else None
+    first_product = None
+    for payload in payloads:
+        try:
+            data = json.loads(payload)
+        except (TypeError, ValueError):
+            continue
+        for node in _json_nodes(data):
+            typed = _is_typed_product(node)
+            if not typed and not page_name:
+                continue
+            fields = _structured_fields(node)
+            if fields is None:
+                continue
+            if page_name and fields["name"].casefold() == page_name:
+                return fields
+            if typed and first_product is None:
+                first_product = fields
+    return first_product
+
+
+def parse_product_html(text):
+    tree = lxml_html.fromstring(text)
+
+    name = _first_text(tree, TITLE_XPATH)
+    description = _first_text(tree, DESCRIPTION_XPATH)
+
+    # Données structurées d'abord, sélecteurs du DOM en secours
+    fields = structured_product((el.text_content() for el in tree.xpath(STRUCTURED_XPATH)), name)
+    if fields:
+        # Description absente du JSON : celle de la page
+        if not fields["description"] and description:
+            fields["description"] = description
+        return fields
+
+    price = _first_text(tree, PRICE_XPATH)
+
+    # Page rendue en JavaScript : le HTML statique ne suffit pas
+    if not name or not price or description is None:
+        return None
+    return {"name": name, "price": price, "description": description}
+
+
+class HttpFetcher:
+    def __init__(self, user_agent, timeout=10, pool_size=10, scheduler=None, tracer=None, archive=None):
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self.archive = archive  # SnapshotArchive : HTML brut conservé pour le rejeu
+        self.tracer = tracer or Tracer()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": user_agent,
+            "Accept-Language": "fr-FR,fr;q=0.9",
+        })
+        # Connexions keep-alive partagées par tous les workers
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _get(self, url):
+        if self.scheduler:
+            self.scheduler.acquire(url)
+        with self.tracer.span("http.get", url) as span:
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._report(url, start, error=True)
+                self.tracer.error(f"Erreur HTTP ({url}) : {e}", url)
+                return None
+
+            span["status_code"] = response.status_code
+            # 429 / 5xx : le serveur demande de ralentir
+            overloaded = response.status_code == 429 or response.status_code >= 500
+            self._report(url, start, error=overloaded, retry_after=response.headers.get("Retry-After"))
+            try:
+                response.raise_for_status()
+            except requests.HTTPError as e:
+                self.tracer.error(f"Erreur HTTP ({url}) : {e}", url)
+                return None
+
+            if "charset" not in response.headers.get("Content-Type", ""):
+                response.encoding = response.apparent_encoding
+            return response.text
+
+    def _report(self, url, start, error=False, retry_after=None):
+        if not self.scheduler:
+            return
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        self.scheduler.report(url, time.perf_counter() - start, error=error, retry_after=retry_after)
+
+    def fetch_listing(self, url):
+        text = self._get(url)
+        if text is None:
+            return None
+        if self.archive:
+            self.archive.put(url, "listing", text)
+        with self.tracer.span("extract.listing", url, backend="http") as span:
+            tiles = parse_listing_html(text, url)
+            span["tiles"] = len(tiles)
+        return tiles or None
+
+    def fetch_product(self, url):
+        text = self._get(url)
+        if text is None:
+            return None
+        if self.archive:
+            self.archive.put(url, "product", text)
+        with self.tracer.span("extract.product", url, backend="http") as span:
+            fields = parse_product_html(text)
+            span["found"] = fields is not None
+            span["structured"] = bool(fields) and "price_amount" in fields
+        return fields
+
+    def close(self):
+        self.session.close()
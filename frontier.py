@@ -0,0 +1,215 @@
+import json
+import os
+import socket
+import threading
+import time
+
+from sqlite_shared import connect_shared, immediate_transaction
+
+# ============================================================
+# ---------------   FRONTIÈRE DE CRAWL PARTAGÉE (SQLITE)   ---------------
+# ============================================================
+# File de tâches durable partagée par plusieurs processus (chacun avec son
+# propre navigateur). Une tâche est une URL de liste ou de page produit :
+#   - lease : un worker prend des tâches pour `lease_ttl` secondes ;
+#   - ack   : tâche terminée ; nack : remise en file (ou abandon après
+#     `max_attempts` essais) ;
+#   - un bail expiré (worker planté) rend la tâche à nouveau disponible.
+# Lease, ack et ajout de cibles sont sérialisés entre tous les processus
+# (BEGIN IMMEDIATE, voir sqlite_shared.py).
+# La clé primaire des tâches sert d'ensemble des URL déjà vues : une page
+# présente dans plusieurs listes n'est récupérée qu'une fois, et les
+# produits résultants sont écrits pour chaque étape qui l'a retenue.
+
+DEFAULT_FRONTIER_PATH = "crawl_frontier.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    targets TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_until REAL,
+    last_error TEXT,
+    fields TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, kind);
+CREATE TABLE IF NOT EXISTS targets (
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    concern_key TEXT NOT NULL,
+    step TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (url, kind, concern_key, step)
+);
+CREATE TABLE IF NOT EXISTS products (
+    kind TEXT NOT NULL,
+    concern_key TEXT NOT NULL,
+    step TEXT NOT NULL,
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, concern_key, step, url)
+);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+
+
+class CrawlFrontier:
+    def __init__(self, path=DEFAULT_FRONTIER_PATH, lease_ttl=300, max_attempts=3):
+        self.path = path
+        self.lease_ttl = lease_ttl        # secondes avant redistribution d'une tâche
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = connect_shared(path)
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _insert_products(conn, rows):
+        conn.executemany(
+            "INSERT OR REPLACE INTO products (kind, concern_key, step, url, position, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(kind, concern_key, step, url, position, json.dumps(data, ensure_ascii=False))
+             for kind, concern_key, step, url, position, data in rows]
+        )
+
+    # -----------------------------
+    # Alimentation
+    # -----------------------------
+    def enqueue_listing(self, url, targets):
+        # targets : [(kind, concern_key, step), ...] servis par cette liste
+        with immediate_transaction(self._conn, self._lock) as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO tasks (url, kind, targets, updated_at) VALUES (?, 'listing', ?, ?)",
+                (url, json.dumps([list(t) for t in targets]), time.time())
+            )
+        return cursor.rowcount == 1
+
+    def add_target(self, url, target, build):
+        # Rattache une page produit à une étape (kind, concern_key, step,
+        # position). Page déjà récupérée : build(fields, [target]) produit
+        # tout de suite les lignes de produits. Renvoie True si l'URL est nouvelle.
+        with immediate_transaction(self._conn, self._lock) as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO tasks (url, kind, updated_at) VALUES (?, 'product', ?)",
+                (url, time.time())
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO targets (url, kind, concern_key, step, position) VALUES (?, ?, ?, ?, ?)",
+                (url, *target)
+            )
+            row = conn.execute("SELECT fields FROM tasks WHERE url = ? AND status = 'done'", (url,)).fetchone()
+            if row and row[0]:
+                self._insert_products(conn, build(json.loads(row[0]), [target]))
+        return cursor.rowcount == 1
+
+    # -----------------------------
+    # Distribution
+    # -----------------------------
+    def lease(self, worker_id, limit=1):
+        # Listes d'abord (elles alimentent la file), puis pages produits
+        now = time.time()
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', lease_owner = NULL, "
+                "last_error = COALESCE(last_error, 'bail expiré'), updated_at = ? "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            rows = conn.execute(
+                "SELECT url, kind, targets, attempts FROM tasks "
+                "WHERE status = 'queued' OR (status = 'leased' AND lease_until < ?) "
+                "ORDER BY kind = 'product', updated_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_until = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE url = ?",
+                [(worker_id, now + self.lease_ttl, now, row[0]) for row in rows]
+            )
+        return [
+            {"url": url, "kind": kind, "targets": json.loads(targets), "attempts": attempts + 1}
+            for url, kind, targets, attempts in rows
+        ]
+
+    def ack(self, url, worker_id):
+        # Sans effet si le bail a expiré et que la tâche a été redonnée
+        with immediate_transaction(self._conn, self._lock) as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', lease_owner = NULL, updated_at = ? "
+                "WHERE url = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time(), url, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete_product(self, url, worker_id, fields, build):
+        # ack d'une page produit : champs enregistrés et produits écrits pour
+        # toutes les étapes connues, dans la même transaction
+        with immediate_transaction(self._conn, self._lock) as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', lease_owner = NULL, fields = ?, updated_at = ? "
+                "WHERE url = ? AND status = 'leased' AND lease_owner = ?",
+                (json.dumps(fields, ensure_ascii=False), time.time(), url, worker_id)
+            )
+            if cursor.rowcount != 1:
+                return False
+            targets = conn.execute(
+                "SELECT kind, concern_key, step, position FROM targets WHERE url = ?", (url,)
+            ).fetchall()
+            self._insert_products(conn, build(fields, targets))
+        return True
+
+    def nack(self, url, worker_id, error):
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "lease_owner = NULL, last_error = ?, updated_at = ? "
+                "WHERE url = ? AND status = 'leased' AND lease_owner = ?",
+                (self.max_attempts, error, time.time(), url, worker_id)
+            )
+
+    # -----------------------------
+    # Lecture
+    # -----------------------------
+    def remaining(self):
+        # Tâches encore à faire (en file ou en cours)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN ('queued', 'leased')"
+            ).fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status").fetchall()
+        stats = {}
+        for kind, status, count in rows:
+            stats.setdefault(kind, {})[status] = count
+        return stats
+
+    def products(self, kind, concern_key):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM products WHERE kind = ? AND concern_key = ? ORDER BY step, position",
+                (kind, concern_key)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    # -----------------------------
+    # Maintenance
+    # -----------------------------
+    def reset(self):
+        # Nouveau passage complet : file, URL vues et produits effacés
+        with immediate_transaction(self._conn, self._lock) as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM targets")
+            conn.execute("DELETE FROM products")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
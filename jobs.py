@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import Tracer
+
+# ============================================================
+# ---------------   TÂCHES DE SCRAPING EN FOND   ---------------
+# ============================================================
+# Le scraping ne tourne plus dans le thread du script Streamlit : chaque
+# demande devient une tâche exécutée par un pool de threads, et la page
+# interroge son état à chaque rafraîchissement. Deux demandes identiques
+# (même clé) pendant qu'une collecte est en cours partagent la même tâche.
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.status = "pending"  # pending, running, done, error
+        self.done = 0            # pages traitées
+        self.total = 0           # pages prévues (0 tant que le plan n'est pas prêt)
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self._products = []
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def report(self, done, total, products=()):
+        # Même signature que le rappel on_page des collecteurs
+        with self._lock:
+            self.done, self.total = done, total
+            self._products.extend(products)
+
+    def products(self):
+        # Produits déjà trouvés (routine provisoire)
+        with self._lock:
+            return list(self._products)
+
+
+class JobManager:
+    def __init__(self, workers=2, keep=600, tracer=None):
+        self.keep = keep  # secondes pendant lesquelles un résultat est réutilisé
+        self.tracer = tracer or Tracer()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, func):
+        # func(job) -> résultat. Une tâche en cours ou terminée récemment
+        # pour la même clé est renvoyée telle quelle : une seule collecte.
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            if job is not None and job.status != "error":
+                return job
+            job = Job(key)
+            self._jobs[key] = job
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def _run(self, job, func):
+        job.status = "running"
+        try:
+            result = func(job)
+        except Exception as e:
+            self.tracer.error(f"Erreur tâche {job.key} : {e}", job=str(job.key))
+            job.error = e
+            job.finished_at = time.time()
+            job.status = "error"
+        else:
+            job.result = result
+            job.finished_at = time.time()
+            job.status = "done"
+
+    def _prune(self):
+        limit = time.time() - self.keep
+        expired = [key for key, job in self._jobs.items() if job.finished and job.finished_at < limit]
+        for key in expired:
+            del self._jobs[key]
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import deque
+
+# ============================================================
+# ---------------   DÉLAIS ADAPTATIFS ET DISJONCTEUR   ---------------
+# ============================================================
+# Les attentes de sélecteurs ne sont plus fixées à 10 s : chaque sélecteur
+# garde ses dernières latences observées et attend p99 × marge (+ un petit
+# supplément), borné entre `floor` et `ceiling`. Une page cassée coûte
+# alors à peu près le temps d'une page normale.
+# Le disjoncteur coupe une catégorie ou un sélecteur après `threshold`
+# échecs dans une fenêtre de `window` secondes, puis laisse passer un
+# essai après `cooldown` secondes (semi-ouvert).
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class AdaptiveTimeouts:
+    def __init__(self, default=10.0, floor=1.0, ceiling=10.0, margin=1.5, extra=0.5,
+                 samples=200, min_samples=20):
+        self.default = default          # délai tant que les mesures manquent
+        self.floor = floor
+        self.ceiling = ceiling
+        self.margin = margin
+        self.extra = extra              # secondes ajoutées au p99 × marge
+        self.min_samples = min_samples
+        self._samples = samples
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        # Seules les attentes réussies renseignent la latence normale
+        with self._lock:
+            if key not in self._latencies:
+                self._latencies[key] = deque(maxlen=self._samples)
+            self._latencies[key].append(seconds)
+
+    def percentile(self, key, q=0.99):
+        with self._lock:
+            observed = sorted(self._latencies.get(key, ()))
+        if not observed:
+            return None
+        return observed[min(len(observed) - 1, int(q * len(observed)))]
+
+    def timeout(self, key):
+        with self._lock:
+            count = len(self._latencies.get(key, ()))
+        if count < self.min_samples:
+            return self.default
+        p99 = self.percentile(key)
+        return min(self.ceiling, max(self.floor, p99 * self.margin + self.extra))
+
+    def report(self):
+        with self._lock:
+            keys = list(self._latencies)
+        return {key: {"p99_s": round(self.percentile(key), 3), "timeout_s": round(self.timeout(key), 3)} for key in keys}
+
+
+class _Circuit:
+    def __init__(self):
+        self.failures = deque()
+        self.opened_at = None
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=5, window=60.0, cooldown=120.0):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, key):
+        if key not in self._circuits:
+            self._circuits[key] = _Circuit()
+        return self._circuits[key]
+
+    def allow(self, key):
+        with self._lock:
+            circuit = self._circuit(key)
+            if circuit.opened_at is None:
+                return True
+            if time.monotonic() - circuit.opened_at < self.cooldown:
+                return False
+            # Semi-ouvert : un essai, le délai repart s'il échoue
+            circuit.opened_at = time.monotonic()
+            return True
+
+    def success(self, key):
+        with self._lock:
+            circuit = self._circuit(key)
+            circuit.failures.clear()
+            circuit.opened_at = None
+
+    def failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit(key)
+            circuit.failures.append(now)
+            while circuit.failures and now - circuit.failures[0] > self.window:
+                circuit.failures.popleft()
+            if len(circuit.failures) >= self.threshold:
+                circuit.opened_at = now
+
+    def open_circuits(self):
+        with self._lock:
+            return [key for key, circuit in self._circuits.items() if circuit.opened_at is not None]
@@ -0,0 +1,63 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+# ============================================================
+# ---------------   POLITESSE : DÉBIT PAR HÔTE   ---------------
+# ============================================================
+# Seau à jetons par hôte : on ne dépasse jamais `max_rate` requêtes par
+# seconde, sans attente inutile quand le seau est plein. Le débit est
+# divisé par deux après une erreur ou une réponse lente, puis remonte
+# progressivement tant que le serveur répond bien.
+
+
+class _HostState:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+
+class HostScheduler:
+    def __init__(self, max_rate=1.0, burst=2, min_rate=0.1, slow_threshold=5.0, recovery=0.05):
+        self.max_rate = max_rate              # requêtes / seconde / hôte
+        self.burst = burst                    # requêtes autorisées d'affilée
+        self.min_rate = min_rate
+        self.slow_threshold = slow_threshold  # secondes
+        self.recovery = recovery              # remontée du débit après un succès
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self.max_rate, self.burst)
+        return self._hosts[host]
+
+    def acquire(self, url):
+        # Réserve un jeton et dort le temps nécessaire ; renvoie l'attente
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            state.tokens -= 1
+            delay = max(0.0, -state.tokens / state.rate)
+
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def report(self, url, elapsed, error=False, retry_after=None):
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._state(host)
+            if error or elapsed > self.slow_threshold:
+                state.rate = max(self.min_rate, state.rate / 2)
+            else:
+                state.rate = min(self.max_rate, state.rate + self.recovery)
+            if retry_after:
+                # Seau vidé et remplissage repoussé : les requêtes suivantes
+                # attendent la fin de la pause puis reprennent au débit réduit
+                state.tokens = 0
+                state.updated = max(state.updated, time.monotonic() + retry_after)
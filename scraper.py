@@ -1,15 +1,37 @@
+import os
 import re
+import sys
+import json
+import argparse
 import time
-import random
-from dataclasses import dataclass
+import shutil
+import asyncio
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+import numpy as np
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import WebDriverException, NoSuchElementException, TimeoutException
+from selenium.common.exceptions import (
+    WebDriverException, NoSuchElementException, TimeoutException, SessionNotCreatedException
+)
 from webdriver_manager.chrome import ChromeDriverManager
+from archive import ArchiveReplay, SnapshotArchive, DEFAULT_ARCHIVE_PATH
+from cache import ProductCache
+from catalog import CatalogStore, DEFAULT_CATALOG_DIR
+from fetchers import HttpFetcher, structured_product
+from frontier import CrawlFrontier, DEFAULT_FRONTIER_PATH, default_worker_id
+from resilience import AdaptiveTimeouts, CircuitBreaker, CircuitOpenError
+from scheduler import HostScheduler
+from tracing import Tracer
 
 # ============================================================
 # ---------------   COMMUN   ---------------
@@ -17,18 +39,163 @@ from webdriver_manager.chrome import ChromeDriverManager
 # -----------------------------
 # 1. Structure Produit
 # -----------------------------
-@dataclass
+# Prix affiché ("12,50 €", "à partir de 9,90 €", "1 234,00 €", "€12.50"…)
+PRICE_NUMBER = re.compile(
+    r"\d{1,3}(?:[ \u00a0\u202f.,]\d{3})+(?:[.,]\d{1,2})?(?!\d)"
+    r"|\d+(?:[.,]\d{1,2})?(?!\d)"
+)
+
+
+def parse_price_cents(price):
+    # Prix en centimes ; pour une fourchette ou un prix barré, le plus bas.
+    # Si certains nombres touchent le symbole €, seuls ceux-là comptent
+    # ("Lot de 2 — 12,50 €").
+    candidates = []
+    for m in PRICE_NUMBER.finditer(price):
+        near_currency = "€" in price[max(0, m.start() - 2):m.start()] + price[m.end():m.end() + 2]
+        raw = m.group(0)
+        decimal = re.search(r"[.,](\d{1,2})$", raw)
+        if decimal:
+            units, cents = raw[:decimal.start()], decimal.group(1).ljust(2, "0")
+        else:
+            units, cents = raw, "00"
+        value = int(re.sub(r"\D", "", units) or 0) * 100 + int(cents)
+        candidates.append((near_currency, value))
+
+    if not candidates:
+        return None
+    if any(near for near, _ in candidates):
+        candidates = [c for c in candidates if c[0]]
+    return min(value for _, value in candidates)
+
+
+@dataclass(slots=True)
 class Product:
     name: str
-    price: str
+    price: str          # prix affiché, tel que sur le site
     url: str
     description: str
     concern: str
     category: str
+    # Calculés une seule fois à la construction / au premier scoring
+    price_cents: int | None = field(init=False, default=None, compare=False)
+    keyword_hits: frozenset | None = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.price_cents = parse_price_cents(self.price)
+        # Chaînes partagées entre tous les produits (peu de valeurs distinctes)
+        self.concern = sys.intern(self.concern)
+        self.category = sys.intern(self.category)
+
+    # Format d'échange (catalogue JSON, exports)
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "price": self.price,
+            "url": self.url,
+            "description": self.description,
+            "concern": self.concern,
+            "category": self.category,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            name=data["name"],
+            price=data["price"],
+            url=data["url"],
+            description=data["description"],
+            concern=data["concern"],
+            category=data["category"],
+        )
+
+
+def default_product(step, concern_label):
+    # Produit générique quand aucune étape de la routine n'a de candidat
+    return Product(
+        name="Produit recommandé par défaut",
+        price="9,99 €",
+        description="Produit générique ajouté automatiquement pour compléter la routine.",
+        url="https://www.lookfantastic.fr",
+        category=step,
+        concern=concern_label
+    )
+
+# -----------------------------
+# 2. Mots-clés compilés
+# -----------------------------
+# Tous les mots-clés des règles (catégories, scoring) sont compilés dans
+# une seule expression : le texte d'un produit est parcouru une fois et on
+# obtient l'ensemble des mots-clés présents, réutilisé par la détection de
+# catégorie et par le scoring de tous les profils.
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.keywords = sorted(set(keywords))
+        # Expression en arbre de préfixes (trie) : à une position donnée, le
+        # mot-clé le plus long gagne ("oily hair" plutôt que "oily" ou "oil")
+        self._regex = re.compile("(?=(" + self._trie_pattern(self.keywords) + "))")
+        # Mots-clés qui commencent à la même position que le mot trouvé
+        self._prefixes = {
+            k: frozenset(other for other in self.keywords if k.startswith(other))
+            for k in self.keywords
+        }
+
+    @staticmethod
+    def _trie_pattern(keywords):
+        trie = {}
+        for word in keywords:
+            node = trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+
+        def build(node):
+            branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            return "(?:" + body + ")?" if "" in node else body
+
+        return build(trie)
+
+    def hits(self, text):
+        found = set()
+        for m in self._regex.finditer(text.lower()):
+            found |= self._prefixes[m.group(1)]
+        return frozenset(found)
+
+
+def rule_keywords(*rule_sets):
+    # Mots-clés de règles de scoring {clé: [(mots-clés, points), ...]}
+    return [word for rules in rule_sets for entry in rules.values() for words, _ in entry for word in words]
+
+
+def product_hits(product):
+    # Vecteur de mots-clés calculé une seule fois par produit
+    if product.keyword_hits is None:
+        product.keyword_hits = KEYWORDS.hits(product.name + " " + product.description)
+    return product.keyword_hits
+
+
+def rules_score(hits, rules):
+    return sum(points for words, points in rules if not hits.isdisjoint(words))
+
+
+def category_from_hits(hits, category_rules, default):
+    for category, words in category_rules:
+        if not hits.isdisjoint(words):
+            return category
+    return default
 
 # -----------------------------
-# 2. Base Scraper
+# 3. Base Scraper
 # -----------------------------
+# Page chargée mais sans prix (rupture de stock) : issue normale d'une
+# page, pas une panne du site ; le disjoncteur ne la compte pas
+class PageWithoutPrice(NoSuchElementException):
+    pass
+
+
 class BaseScraper:
     USER_AGENT = (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -36,12 +203,167 @@ class BaseScraper:
         "Chrome/122.0.0.0 Safari/537.36"
     )
 
-    def __init__(self, headless=False):
+    # Nombre maximal de navigateurs ouverts en même temps sur le site
+    MAX_WORKERS = 4
+
+    # Chemin du chromedriver épinglé à la première résolution, partagé
+    # entre les processus (évite ChromeDriverManager et le réseau ensuite)
+    DRIVER_PIN_FILE = os.path.join(os.path.expanduser("~"), ".cache", "beauty-assistant", "chromedriver.json")
+    _driver_path = None
+    _driver_path_lock = threading.Lock()
+
+    # Profils de chargement des pages dans Chrome. "light" ne garde que le
+    # HTML, les scripts et les styles : images, vidéos, polices et traceurs
+    # sont bloqués et driver.get rend la main dès que le DOM est prêt.
+    LOAD_PROFILES = {
+        "full": {
+            "page_load_strategy": "normal",
+            "block_images": False,
+            "blocked_urls": [],
+        },
+        "light": {
+            "page_load_strategy": "eager",
+            "block_images": True,
+            "blocked_urls": [
+                "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+                "*.woff", "*.woff2", "*.ttf", "*.otf",
+                "*.mp4", "*.webm", "*.m3u8",
+                "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+                "*facebook.net*", "*hotjar.com*", "*criteo.*", "*tiktok.com*", "*pinterest.com*",
+            ],
+        },
+    }
+
+    def __init__(self, headless=False, cache=None, workers=1, backend="http", offline=None,
+                 load_profile="light", js_extraction=True, scheduler=None, tracer=None,
+                 timeouts=None, breaker=None, archive=None):
+        if load_profile not in self.LOAD_PROFILES:
+            raise ValueError(f"Profil de chargement inconnu : {load_profile}")
+        self.load_profile = load_profile
+        # Extraction groupée via execute_script (sans attente implicite)
+        self.js_extraction = js_extraction
         self.headless = headless
-        self.driver = None
-        self._init_driver()
+        self.cache = cache
+        self.workers = max(1, min(workers, self.MAX_WORKERS))
+        # Débit par hôte partagé par le navigateur et le backend HTTP
+        self.scheduler = scheduler or HostScheduler()
+        # Spans de chaque étape (driver, navigation, attentes, extraction)
+        # et erreurs : voir tracing.py
+        self.tracer = tracer or Tracer()
+        # Délais d'attente appris par sélecteur et disjoncteur par
+        # catégorie / sélecteur (voir resilience.py)
+        self.timeouts = timeouts or AdaptiveTimeouts()
+        self.breaker = breaker or CircuitBreaker()
+        # Archive des pages récupérées (voir archive.py), None : désactivée
+        self.archive = archive
+        # Mode hors ligne : jamais de téléchargement du driver
+        self.offline = os.environ.get("SCRAPER_OFFLINE") == "1" if offline is None else offline
+        self._driver = None
+        self._cookie_sessions = set()
+
+        # Re-crawl incrémental (voir begin_incremental_refresh)
+        self.incremental = False
+        self._synced_listings = set()
+        self._dirty_links = set()
+        self.refresh_stats = {}
+        self._stats_lock = threading.Lock()
+
+        # Temps cumulés (secondes) : résolution du driver, lancement de Chrome, navigation
+        self.timings = {"driver_resolve": 0.0, "driver_start": 0.0, "navigation": 0.0, "navigations": 0}
+        self._timings_lock = threading.Lock()
+
+        # Pool de drivers pour les workers (threads)
+        self._local = threading.local()
+        self._pool = queue.Queue()
+        self._pool_drivers = []
+        self._pool_lock = threading.Lock()
+
+        # Backend de récupération : "http" (requests + lxml, Selenium en secours),
+        # "selenium" (navigateur uniquement) ou un objet fournissant
+        # fetch_listing(url) / fetch_product(url)
+        if backend == "http":
+            self.fetcher = HttpFetcher(
+                self.USER_AGENT, pool_size=max(10, self.workers), scheduler=self.scheduler, tracer=self.tracer,
+                archive=archive
+            )
+        elif backend == "selenium":
+            self.fetcher = None
+        else:
+            self.fetcher = backend
+
+    # Chrome n'est lancé qu'au premier accès : un scraping servi
+    # entièrement par le cache n'ouvre jamais de navigateur.
+    # Dans un worker du pool, chaque thread reçoit son propre driver.
+    @property
+    def driver(self):
+        if getattr(self._local, "in_pool", False):
+            if self._local.driver is None:
+                self._local.driver = self._acquire_pool_driver()
+            return self._local.driver
+        if self._driver is None:
+            self._init_driver()
+        return self._driver
+
+    @driver.setter
+    def driver(self, value):
+        self._driver = value
 
     def _init_driver(self):
+        self.driver = self._create_driver()
+
+    # -----------------------------
+    # Résolution du chromedriver
+    # -----------------------------
+    @classmethod
+    def _read_pinned_driver(cls):
+        try:
+            with open(cls.DRIVER_PIN_FILE, encoding="utf-8") as f:
+                path = json.load(f).get("path")
+        except (OSError, ValueError):
+            return None
+        return path if path and os.path.exists(path) else None
+
+    @classmethod
+    def _pin_driver(cls, path, tracer=None):
+        try:
+            os.makedirs(os.path.dirname(cls.DRIVER_PIN_FILE), exist_ok=True)
+            tmp = cls.DRIVER_PIN_FILE + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"path": path, "pinned_at": time.time()}, f)
+            os.replace(tmp, cls.DRIVER_PIN_FILE)
+        except OSError as e:
+            (tracer or Tracer()).error(f"Impossible d'épingler le driver : {e}")
+
+    @classmethod
+    def resolve_driver_path(cls, offline=False, refresh=False, tracer=None):
+        # Ordre : CHROMEDRIVER_PATH, mémo du processus, fichier épinglé,
+        # chromedriver du PATH (hors ligne) et enfin ChromeDriverManager
+        env_path = os.environ.get("CHROMEDRIVER_PATH")
+        if env_path:
+            return env_path
+
+        with cls._driver_path_lock:
+            if not refresh:
+                if cls._driver_path and os.path.exists(cls._driver_path):
+                    return cls._driver_path
+                cls._driver_path = cls._read_pinned_driver()
+                if cls._driver_path:
+                    return cls._driver_path
+
+            if offline:
+                cls._driver_path = shutil.which("chromedriver")
+                if not cls._driver_path:
+                    raise WebDriverException(
+                        "Mode hors ligne : aucun chromedriver épinglé ni dans le PATH "
+                        "(définir CHROMEDRIVER_PATH)"
+                    )
+                return cls._driver_path
+
+            cls._driver_path = ChromeDriverManager().install()
+            cls._pin_driver(cls._driver_path, tracer)
+            return cls._driver_path
+
+    def _create_driver(self):
         options = Options()
         options.add_argument(f"user-agent={self.USER_AGENT}")
         options.add_argument("--disable-blink-features=AutomationControlled")
@@ -49,94 +371,266 @@ class BaseScraper:
         if self.headless:
             options.add_argument("--headless=new")
 
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=options)
-        self.driver.implicitly_wait(10)
+        profile = self.LOAD_PROFILES[self.load_profile]
+        options.page_load_strategy = profile["page_load_strategy"]
+        if profile["block_images"]:
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+        with self.tracer.span("driver.init", load_profile=self.load_profile) as span:
+            start = time.perf_counter()
+            driver_path = self.resolve_driver_path(self.offline, tracer=self.tracer)
+            resolved = time.perf_counter()
+
+            try:
+                driver = webdriver.Chrome(service=Service(driver_path), options=options)
+            except SessionNotCreatedException:
+                # Driver épinglé incompatible avec le Chrome installé (mise à jour)
+                if self.offline or os.environ.get("CHROMEDRIVER_PATH"):
+                    raise
+                driver_path = self.resolve_driver_path(refresh=True, tracer=self.tracer)
+                driver = webdriver.Chrome(service=Service(driver_path), options=options)
+            # Les attentes explicites (délais adaptatifs) suffisent : pas de
+            # pénalité de 10 s à chaque élément absent
+            driver.implicitly_wait(0)
+            self._block_urls(driver, profile["blocked_urls"])
+            started = time.perf_counter()
+            span["resolve_ms"] = round((resolved - start) * 1000, 3)
+
+        self._record_timing("driver_resolve", resolved - start)
+        self._record_timing("driver_start", started - resolved)
+        print(
+            f"Driver prêt en {started - start:.2f}s "
+            f"(résolution {resolved - start:.2f}s, lancement {started - resolved:.2f}s)"
+        )
+        return driver
 
-    def _wait(self, a=1.5, b=3.0):
-        time.sleep(random.uniform(a, b))
+    def _block_urls(self, driver, patterns):
+        if not patterns:
+            return
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        except WebDriverException as e:
+            self.tracer.error(f"Blocage des ressources indisponible : {e}")
+
+    # -----------------------------
+    # Mesures de temps
+    # -----------------------------
+    def _record_timing(self, key, seconds):
+        with self._timings_lock:
+            self.timings[key] += seconds
+
+    def _navigate(self, url):
+        # Le planificateur impose le débit par hôte (plus de pause fixe)
+        driver = self.driver
+        self.scheduler.acquire(url)
+        with self.tracer.span("navigate", url):
+            start = time.perf_counter()
+            try:
+                driver.get(url)
+            except WebDriverException:
+                self.scheduler.report(url, time.perf_counter() - start, error=True)
+                raise
+            self.scheduler.report(url, time.perf_counter() - start)
+        with self._timings_lock:
+            self.timings["navigation"] += time.perf_counter() - start
+            self.timings["navigations"] += 1
+
+    def timing_report(self):
+        with self._timings_lock:
+            t = dict(self.timings)
+        driver_init = t["driver_resolve"] + t["driver_start"]
+        avg = t["navigation"] / t["navigations"] if t["navigations"] else 0.0
+        return (
+            f"Initialisation driver : {driver_init:.2f}s "
+            f"(résolution {t['driver_resolve']:.2f}s, lancement {t['driver_start']:.2f}s) — "
+            f"navigation : {t['navigation']:.2f}s sur {t['navigations']} pages ({avg:.2f}s/page)"
+            + (f" — circuits ouverts : {', '.join(opened)}" if (opened := self.breaker.open_circuits()) else "")
+            + (" — délais appris : " + ", ".join(f"{key} {r['timeout_s']:.2f}s" for key, r in learned.items())
+               if (learned := self.timeouts.report()) else "")
+        )
+
+    def _wait_for(self, css, timeout=None, clickable=False, optional=False, url=None):
+        # Attente d'un sélecteur, mesurée comme un span à part entière. Délai
+        # appris (p99 + marge) sauf valeur imposée ; un sélecteur qui échoue
+        # en série est coupé. optional : élément souvent absent (description,
+        # bandeau cookies), ses échecs n'ouvrent pas le disjoncteur. url : page
+        # visitée, pour le span (sans aller-retour WebDriver par current_url).
+        if not optional and not self.breaker.allow(css):
+            raise TimeoutException(f"Circuit ouvert pour le sélecteur {css}")
+        timeout = self.timeouts.timeout(css) if timeout is None else timeout
+        condition = EC.element_to_be_clickable if clickable else EC.presence_of_element_located
+
+        with self.tracer.span("wait", url, selector=css, timeout=round(timeout, 3)):
+            start = time.perf_counter()
+            try:
+                element = WebDriverWait(self.driver, timeout).until(condition((By.CSS_SELECTOR, css)))
+            except TimeoutException:
+                if not optional:
+                    self.breaker.failure(css)
+                raise
+        self.timeouts.record(css, time.perf_counter() - start)
+        if not optional:
+            self.breaker.success(css)
+        return element
+
+    def _guarded(self, keys, func, *args):
+        # Disjoncteur par catégorie, autour des seuls accès réseau (les
+        # pages du cache ne sont ni bloquées ni comptées) : si toutes les
+        # catégories concernées sont coupées, la page n'est pas visitée
+        if keys and not any([self.breaker.allow(key) for key in keys]):
+            raise CircuitOpenError(f"Circuit ouvert : {', '.join(keys)}")
+        try:
+            result = func(*args)
+        except PageWithoutPrice:
+            raise
+        except Exception:
+            for key in keys:
+                self.breaker.failure(key)
+            raise
+        for key in keys:
+            self.breaker.success(key)
+        return result
+
+    # -----------------------------
+    # Pool de drivers
+    # -----------------------------
+    def _acquire_pool_driver(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if len(self._pool_drivers) < self.workers:
+                driver = self._create_driver()
+                self._pool_drivers.append(driver)
+                return driver
+        return self._pool.get()
+
+    def _run_in_pool(self, func, item):
+        self._local.in_pool = True
+        self._local.driver = None
+        try:
+            return item, func(item), None
+        except Exception as e:
+            return item, None, e
+        finally:
+            if self._local.driver is not None:
+                self._pool.put(self._local.driver)
+            self._local.in_pool = False
+            self._local.driver = None
+
+    def map_pages(self, func, items):
+        # Applique func à chaque élément, réparti sur self.workers navigateurs.
+        # Les résultats (item, résultat, erreur) sortent dans l'ordre de items.
+        items = list(items)
+        if self.workers == 1 or len(items) <= 1:
+            for item in items:
+                try:
+                    yield item, func(item), None
+                except Exception as e:
+                    yield item, None, e
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(lambda item: self._run_in_pool(func, item), items)
+
+    def is_alive(self):
+        # Vérifie que les navigateurs déjà lancés répondent encore
+        drivers = [self._driver] if self._driver else []
+        with self._pool_lock:
+            drivers += self._pool_drivers
+        for driver in drivers:
+            try:
+                driver.current_url
+            except WebDriverException:
+                return False
+        return True
 
     def close(self):
-        if self.driver:
-            self.driver.quit()
+        if self._driver:
+            self._driver.quit()
+            self._driver = None
+        with self._pool_lock:
+            for driver in self._pool_drivers:
+                try:
+                    driver.quit()
+                except WebDriverException:
+                    pass
+            self._pool_drivers = []
+            self._pool = queue.Queue()
+        if self.fetcher and hasattr(self.fetcher, "close"):
+            self.fetcher.close()
 
 # ============================================================
 # ---------------      MODULE SKINCARE         ---------------
 # ============================================================
 
 # -----------------------------
-# 3. Fonctions "IA skincare"
+# 4. Fonctions "IA skincare"
 # -----------------------------
+# Règles exprimées en données : (mots-clés, points). Tous les mots-clés
+# sont compilés une seule fois dans KEYWORDS (voir fin du module).
+SKIN_CATEGORY_RULES = [
+    ("cleanser", ("cleanser", "wash", "gel", "mousse", "nettoyant")),
+    ("toner", ("toner", "lotion tonique")),
+    ("serum", ("serum", "sérum")),
+    ("moisturizer", ("cream", "crème", "moisturiser", "moisturizer", "soin hydratant")),
+    ("spf", ("spf", "sunscreen", "écran solaire", "protection solaire")),
+]
+
+# Problème principal
+SKIN_CONCERN_RULES = {
+    "1": [  # Acné
+        (("salicylic", "acide salicylique"), 4),
+        (("non comédogène", "non comedogenic"), 3),
+        (("purifiant", "clarifying"), 2),
+    ],
+    "2": [  # Peau sèche
+        (("hyaluronic", "acide hyaluronique"), 4),
+        (("glycérine", "glycerin"), 3),
+        (("nourrissant", "rich"), 2),
+    ],
+    "3": [  # Anti-âge
+        (("retinol", "rétinol"), 4),
+        (("peptide",), 3),
+        (("firming", "fermeté"), 2),
+    ],
+}
+
+# Type de peau
+SKIN_TYPE_RULES = {
+    "1": [  # sèche
+        (("dry skin", "peau sèche"), 3),
+    ],
+    "2": [  # mixte
+        (("combination", "peau mixte"), 3),
+    ],
+    "3": [  # grasse
+        (("oily", "peau grasse"), 3),
+        (("matifiant", "matte"), 2),
+    ],
+    "4": [  # sensible
+        (("sensitive", "peau sensible"), 3),
+        (("fragrance free", "sans parfum"), 2),
+    ],
+}
+
 def detect_category(name: str, description: str) -> str:
-    text = (name + " " + description).lower()
-
-    if any(k in text for k in ["cleanser", "wash", "gel", "mousse", "nettoyant"]):
-        return "cleanser"
-    if "toner" in text or "lotion tonique" in text:
-        return "toner"
-    if "serum" in text or "sérum" in text:
-        return "serum"
-    if any(k in text for k in ["cream", "crème", "moisturiser", "moisturizer", "soin hydratant"]):
-        return "moisturizer"
-    if any(k in text for k in ["spf", "sunscreen", "écran solaire", "protection solaire"]):
-        return "spf"
-    return "other"
+    hits = KEYWORDS.hits(name + " " + description)
+    return category_from_hits(hits, SKIN_CATEGORY_RULES, "other")
 
 def score_product_for_profile(product: Product, concern_key: str, skin_type_key: str, budget_max: float | None) -> int:
-    text = (product.name + " " + product.description).lower()
-    score = 0
-
-    # Problème principal
-    if concern_key == "1":  # Acné
-        if "salicylic" in text or "acide salicylique" in text:
-            score += 4
-        if "non comédogène" in text or "non comedogenic" in text:
-            score += 3
-        if "purifiant" in text or "clarifying" in text:
-            score += 2
-    elif concern_key == "2":  # Peau sèche
-        if "hyaluronic" in text or "acide hyaluronique" in text:
-            score += 4
-        if "glycérine" in text or "glycerin" in text:
-            score += 3
-        if "nourrissant" in text or "rich" in text:
-            score += 2
-    elif concern_key == "3":  # Anti-âge
-        if "retinol" in text or "rétinol" in text:
-            score += 4
-        if "peptide" in text:
-            score += 3
-        if "firming" in text or "fermeté" in text:
-            score += 2
-
-    # Type de peau
-    if skin_type_key == "1":  # sèche
-        if "dry skin" in text or "peau sèche" in text:
-            score += 3
-    elif skin_type_key == "2":  # mixte
-        if "combination" in text or "peau mixte" in text:
-            score += 3
-    elif skin_type_key == "3":  # grasse
-        if "oily" in text or "peau grasse" in text:
-            score += 3
-        if "matifiant" in text or "matte" in text:
-            score += 2
-    elif skin_type_key == "4":  # sensible
-        if "sensitive" in text or "peau sensible" in text:
-            score += 3
-        if "fragrance free" in text or "sans parfum" in text:
-            score += 2
+    hits = product_hits(product)
+    score = rules_score(hits, SKIN_CONCERN_RULES.get(concern_key, ()))
+    score += rules_score(hits, SKIN_TYPE_RULES.get(skin_type_key, ()))
 
     # Budget
-    if budget_max is not None:
-        try:
-            price_num = float(product.price.replace("€", "").replace(",", ".").strip())
-            if price_num <= budget_max:
-                score += 2
-            else:
-                score -= 2
-        except ValueError:
-            pass
+    if budget_max is not None and product.price_cents is not None:
+        if product.price_cents <= budget_max * 100:
+            score += 2
+        else:
+            score -= 2
 
     return score
 
@@ -175,20 +669,50 @@ def build_routine(products, concern_key, skin_type_key, budget_max):
     # Ajout de produits par défaut si nécessaire
     for step in routine:
         if routine[step] is None:
-            routine[step] = Product(
-                name="Produit recommandé par défaut",
-                price="9,99 €",
-                description="Produit générique ajouté automatiquement pour compléter la routine.",
-                url="https://www.lookfantastic.fr",
-                category=step,
-                concern=concern_label
-            )
+            routine[step] = default_product(step, concern_label)
 
     return routine
 
+def prefilter_tiles(tiles, pattern):
+    # Classe les vignettes d'une catégorie selon le nombre de mots du
+    # problème de peau trouvés dans leur texte (titre, accroche, badges) :
+    # les liens prometteurs passent en tête du budget de pages à visiter.
+    regex = re.compile(pattern, re.IGNORECASE)
+
+    def tile_score(tile):
+        text = tile.get("text") or tile.get("title") or ""
+        return len(set(m.group(0).lower() for m in regex.finditer(text)))
+
+    # Tri stable : à score égal, l'ordre de la page est conservé
+    return sorted(tiles, key=tile_score, reverse=True)
+
 # -----------------------------
-# 4. Scraper Lookfantastic FR
+# 5. Scraper Lookfantastic FR
 # -----------------------------
+# Frontière dédoublonnée d'une collecte : cible = (kind, concern_key, step,
+# url de liste), chaque lien produit pointe vers les cibles qui l'utilisent
+class FetchPlan:
+    def __init__(self, targets):
+        self.targets = list(targets)
+        self.links = {}     # cible -> liens retenus (dans l'ordre de la liste)
+        self.frontier = {}  # lien -> cibles
+
+    def listing_urls(self):
+        return list(dict.fromkeys(target[3] for target in self.targets))
+
+    def add(self, target, links):
+        self.links[target] = links
+        for link in links:
+            self.frontier.setdefault(link, []).append(target)
+
+    def summary(self):
+        page_refs = sum(len(links) for links in self.links.values())
+        return (
+            f"Plan : {len(self.listing_urls())} listes ({len(self.targets)} étapes), "
+            f"{len(self.frontier)} pages à visiter ({page_refs} références)"
+        )
+
+
 class LookfantasticScraper(BaseScraper):
 
     # Problèmes principaux
@@ -218,79 +742,198 @@ class LookfantasticScraper(BaseScraper):
         "spf": "https://www.lookfantastic.fr/c/health-beauty/face/suncare/"
     }
 
-    def _accept_cookies(self):
-        try:
-            btn = WebDriverWait(self.driver, 5).until(
-                EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-            )
-            btn.click()
-        except:
-            pass
-
-    def _scrape_category(self, url, concern_key):
-        concern_name, pattern, _ = self.CONCERNS[concern_key]
-
-        self.driver.get(url)
-        self._accept_cookies()
-        self._wait()
-
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div.product-data"))
-        )
-
-        product_elements = self.driver.find_elements(By.CSS_SELECTOR, "div.product-data")
-
-        links = []
-        for el in product_elements:
+    BASE_URL = "https://www.lookfantastic.fr/"
+
+    # Extraction en un seul aller-retour WebDriver par page
+    LISTING_JS = """
+        return Array.from(document.querySelectorAll('div.product-data')).map(el => {
+            const a = el.querySelector('a.product-item-title');
+            if (!a || !a.href) return null;
+            const price = el.querySelector('[class*="price"]');
+            return {
+                href: a.href,
+                title: a.innerText.trim(),
+                price: price ? price.innerText.trim() : '',
+                text: el.innerText
+            };
+        }).filter(Boolean);
+    """
+
+    PRODUCT_JS = """
+        const text = sel => {
+            const el = document.querySelector(sel);
+            return el ? el.innerText : null;
+        };
+        return {
+            name: text('h1#product-title'),
+            price: text('span.text-gray-900'),
+            description: text('div#product-description-0'),
+            state: document.readyState
+        };
+    """
+
+    # Contenu des balises JSON (JSON-LD schema.org, état produit embarqué),
+    # présentes dès le HTML initial : lues sans attendre le rendu, avec le
+    # titre (produit de la page) et la description s'ils sont déjà là
+    STRUCTURED_JS = """
+        const text = sel => {
+            const el = document.querySelector(sel);
+            return el ? el.innerText : null;
+        };
+        return {
+            payloads: Array.from(document.querySelectorAll(
+                'script[type="application/ld+json"], script#__NEXT_DATA__'
+            )).map(el => el.textContent),
+            title: text('h1#product-title'),
+            description: text('div#product-description-0')
+        };
+    """
+
+    def _accept_cookies(self, url=None):
+        # Une fois le bandeau accepté, le cookie reste valable pour toute
+        # la session du navigateur : inutile d'attendre le bouton à nouveau
+        session_id = self.driver.session_id
+        if session_id in self._cookie_sessions:
+            return
+        with self.tracer.span("cookies", url) as span:
             try:
-                a = el.find_element(By.CSS_SELECTOR, "a.product-item-title")
-                href = a.get_attribute("href")
-                if href:
-                    links.append(href)
+                btn = self._wait_for("#onetrust-accept-btn-handler", timeout=5, clickable=True, optional=True, url=url)
+                btn.click()
+                self._cookie_sessions.add(session_id)
+                span["accepted"] = True
             except:
-                continue
+                span["accepted"] = False
+
+    def warm_up(self):
+        # Lance Chrome et règle le bandeau cookies avant la première requête,
+        # puis les navigateurs du pool des pages produits (en parallèle)
+        self._navigate(self.BASE_URL)
+        self._accept_cookies(self.BASE_URL)
+        if self.workers > 1:
+            with self._pool_lock:
+                missing = self.workers - len(self._pool_drivers)
+            if missing > 0:
+                with ThreadPoolExecutor(max_workers=missing) as executor:
+                    list(executor.map(lambda _: self._add_pool_driver(), range(missing)))
+
+    def _add_pool_driver(self):
+        driver = self._create_driver()
+        with self._pool_lock:
+            self._pool_drivers.append(driver)
+        self._pool.put(driver)
+
+    # Étapes dont les produits ne sont pas filtrés sur la description
+    UNFILTERED_STEPS = ("mask", "hair_serum")
+
+    def _concern(self, kind, concern_key):
+        # (nom, motif, URL) d'un problème de peau ou de cheveux
+        return (self.HAIR_CONCERNS if kind == "hair" else self.CONCERNS)[concern_key]
+
+    def _scrape_category(self, url, concern_key, step=None):
+        concern_name, pattern, _ = self._concern("skin", concern_key)
+        return concern_name, pattern, self._select_links(self._listing_tiles(url), pattern, step)
+
+    def _listing_tiles(self, url):
+        with self.tracer.span("listing", url) as span:
+            tiles = None
+            # En re-crawl incrémental, chaque liste est rechargée une fois par passage
+            if self.cache and not (self.incremental and url not in self._synced_listings):
+                tiles = self.cache.get_listing(url)
+            span["cached"] = tiles is not None
+            if tiles is None:
+                tiles = self._guarded([url], self._scrape_listing, url)
+                if self.cache and tiles:
+                    if self.incremental:
+                        self._sync_listing(url, tiles)
+                    else:
+                        self.cache.put_listing(url, tiles)
+            span["tiles"] = len(tiles)
+            return tiles
+
+    def _select_links(self, tiles, pattern, step):
+        if step not in self.UNFILTERED_STEPS:
+            tiles = prefilter_tiles(tiles, pattern)
+
+        # Dédoublonnage en gardant l'ordre (résultats déterministes)
+        return list(dict.fromkeys(t["href"] for t in tiles))
+
+    def _scrape_listing(self, url):
+        if self.fetcher:
+            tiles = self.fetcher.fetch_listing(url)
+            if tiles:
+                return tiles
+        tiles = self._selenium_listing(url)
+        self._snapshot(url, "listing")
+        return tiles
+
+    def _snapshot(self, url, kind):
+        # DOM rendu par le navigateur, relu plus tard par le parseur lxml
+        if self.archive:
+            self.archive.put(url, kind, self.driver.page_source)
+
+    def _selenium_listing(self, url):
+        self._navigate(url)
+        self._accept_cookies(url)
+
+        self._wait_for("div.product-data", url=url)
+
+        with self.tracer.span("extract.listing", url, backend="selenium", js=self.js_extraction):
+            if self.js_extraction:
+                return self.driver.execute_script(self.LISTING_JS) or []
+
+            product_elements = self.driver.find_elements(By.CSS_SELECTOR, "div.product-data")
+
+            tiles = []
+            for el in product_elements:
+                try:
+                    a = el.find_element(By.CSS_SELECTOR, "a.product-item-title")
+                    href = a.get_attribute("href")
+                    if href:
+                        tiles.append({"href": href})
+                except:
+                    continue
 
-        links = list(set(links))
-        return concern_name, pattern, links
+            return tiles
 
     def _scrape_product_page(self, link, concern_name, pattern, forced_category=None):
-        self.driver.get(link)
-        self._wait()
-
-        try:
-            name = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "h1#product-title"))
-            ).text
-        except TimeoutException:
-            raise NoSuchElementException("Titre introuvable")
-
-        try:
-            price_el = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "span.text-gray-900"))
-            )
-            price = price_el.text.strip()
-        except TimeoutException:
-            raise NoSuchElementException("Prix introuvable")
+        return self._product_from_fields(link, self._page_fields(link), concern_name, pattern, forced_category)
+
+    def _page_fields(self, link, categories=()):
+        # categories : listes d'où vient la page (clés du disjoncteur)
+        with self.tracer.span("product_page", link) as span:
+            fields = None
+            if self.cache and link not in self._dirty_links:
+                fields = self.cache.get_page(link)
+            span["cached"] = fields is not None
+
+            if fields is None:
+                fields = self._guarded(categories, self._fetch_product_fields, link)
+                if self.cache:
+                    changed = self.cache.put_page(link, fields)
+                    self._dirty_links.discard(link)
+                    self._count("pages_fetched")
+                    if changed:
+                        self._count("pages_changed")
+            else:
+                self._count("pages_reused")
+            return fields
 
-        try:
-            desc_el = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div#product-description-0"))
-            )
-            description = desc_el.text
-        except TimeoutException:
-            description = ""
+    def _product_from_fields(self, link, fields, concern_name, pattern, forced_category=None):
+        name = fields["name"]
+        price = fields["price"]
+        description = fields["description"]
 
         # if not re.search(pattern, description, re.IGNORECASE):
         #    return None
 
         # On ne filtre PAS les masques et sérums (trop de variations)
-        if forced_category not in ["mask", "hair_serum"]:
+        if forced_category not in self.UNFILTERED_STEPS:
             if not re.search(pattern, description, re.IGNORECASE):
                 return None
 
         category = forced_category if forced_category else detect_category(name, description)
 
-        return Product(
+        product = Product(
             name=name,
             price=price,
             url=link,
@@ -298,39 +941,307 @@ class LookfantasticScraper(BaseScraper):
             concern=concern_name,
             category=category
         )
+        # Prix numérique des données structurées : pas de relecture du texte
+        if fields.get("price_amount") is not None:
+            product.price_cents = round(fields["price_amount"] * 100)
+        return product
+
+    def _fetch_product_fields(self, link):
+        if self.fetcher:
+            fields = self.fetcher.fetch_product(link)
+            if fields:
+                return fields
+        fields = self._selenium_product_fields(link)
+        self._snapshot(link, "product")
+        return fields
+
+    def _selenium_product_fields(self, link):
+        self._navigate(link)
+
+        fields = self._structured_product_fields(link)
+        if fields:
+            # Description absente du JSON et pas encore rendue : celle du DOM
+            if not fields["description"]:
+                fields["description"] = self._dom_description(link)
+            return fields
+
+        if self.js_extraction:
+            return self._js_product_fields(link)
 
-    def generate_products(self, links, concern_name, pattern, step):
-        for link in links[:12]:
-            try:
-                p = self._scrape_product_page(link, concern_name, pattern, forced_category=step)
-                if p:
-                    yield p
-            except Exception as e:
-                print(f"Erreur produit ({step}) : {e}")
-                continue
+        try:
+            name = self._wait_for("h1#product-title", url=link).text
+        except TimeoutException:
+            raise NoSuchElementException("Titre introuvable")
+
+        try:
+            # optional : une rupture de stock ne coupe pas le sélecteur du prix
+            price_el = self._wait_for("span.text-gray-900", optional=True, url=link)
+            price = price_el.text.strip()
+        except TimeoutException:
+            raise PageWithoutPrice("Prix introuvable")
 
-    def collect_products_for_routine(self, concern_key):
-        all_products = []
+        return {"name": name, "price": price, "description": self._dom_description(link)}
 
-        for step, url in self.CATEGORY_URLS.items():
+    def _dom_description(self, link):
+        try:
+            return self._wait_for("div#product-description-0", optional=True, url=link).text
+        except TimeoutException:
+            return ""
+
+    def _structured_product_fields(self, link):
+        # Un seul execute_script, aucune attente : None si la page n'expose
+        # pas de données structurées exploitables (repli sur le DOM)
+        with self.tracer.span("extract.structured", link, backend="selenium") as span:
+            page = self.driver.execute_script(self.STRUCTURED_JS) or {}
+            fields = structured_product(page.get("payloads") or [], page.get("title"))
+            if fields and not fields["description"]:
+                fields["description"] = " ".join((page.get("description") or "").split())
+            span["found"] = fields is not None
+        return fields
+
+    # Page entièrement chargée depuis ce délai (secondes) sans prix : classée
+    # tout de suite (rupture de stock, page cassée) au lieu d'attendre
+    EARLY_CLASSIFY_AFTER = 0.5
+
+    def _js_product_fields(self, link):
+        # Un seul execute_script par essai : on relance le script jusqu'à
+        # ce que les trois champs soient rendus, dans un délai appris sur
+        # les pages précédentes
+        fields = {}
+        complete_since = []
+
+        def ready(driver):
+            fields.update(driver.execute_script(self.PRODUCT_JS) or {})
+            if fields.get("name") and fields.get("price") and fields.get("description") is not None:
+                return True
+            if fields.get("state") != "complete":
+                return False
+            if not complete_since:
+                complete_since.append(time.perf_counter())
+            return time.perf_counter() - complete_since[0] >= self.EARLY_CLASSIFY_AFTER
+
+        timeout = self.timeouts.timeout("product-js")
+        with self.tracer.span("extract.product", link, backend="selenium", js=True,
+                              timeout=round(timeout, 3)) as span:
+            start = time.perf_counter()
             try:
-                print(f"\n--- Étape {step} : {url} ---")
-                concern_name, pattern, links = self._scrape_category(url, concern_key)
+                WebDriverWait(self.driver, timeout).until(ready)
+            except TimeoutException:
+                span["timeout"] = True
+            if fields.get("name") and fields.get("price"):
+                self.timeouts.record("product-js", time.perf_counter() - start)
 
-                if not links:
-                    continue
+        if not fields.get("name"):
+            raise NoSuchElementException("Titre introuvable")
+        if not fields.get("price"):
+            raise PageWithoutPrice("Page sans prix (rupture de stock ou page cassée)")
 
-                for p in self.generate_products(links, concern_name, pattern, step):
-                    all_products.append(p)
+        return {
+            "name": fields["name"],
+            "price": fields["price"].strip(),
+            "description": fields.get("description") or ""
+        }
 
-            except WebDriverException as e:
-                print(f"Erreur de navigation ({step}) : {e}")
+    def generate_products(self, links, concern_name, pattern, step):
+        def scrape(link):
+            return self._scrape_product_page(link, concern_name, pattern, forced_category=step)
+
+        for link, p, error in self.map_pages(scrape, links[:12]):
+            if error:
+                self.tracer.error(f"Erreur produit ({step}) : {error}", link, step=step)
+                continue
+            if p:
+                yield p
+
+    def collect_products_for_routine(self, concern_key, on_page=None):
+        results = self.collect(self.plan_targets(skin_concerns=[concern_key]), on_page)
+        return [p for products in results.values() for p in products]
+
+    # -----------------------------
+    # Plan de collecte
+    # -----------------------------
+    # Une même page sert souvent plusieurs étapes ou plusieurs problèmes
+    # (la liste acné est aussi celle des nettoyants, un produit apparaît
+    # dans les hydratants et les SPF). On lit d'abord toutes les listes,
+    # puis chaque page de la frontière est récupérée une seule fois et son
+    # contenu est distribué à toutes les étapes qui l'ont retenue.
+    def plan_targets(self, skin_concerns=(), hair_concerns=()):
+        targets = [
+            ("skin", concern_key, step, url)
+            for concern_key in skin_concerns
+            for step, url in self.CATEGORY_URLS.items()
+        ]
+        targets += [
+            ("hair", concern_key, step, url)
+            for concern_key in hair_concerns
+            for step, url in self.HAIR_CATEGORY_URLS.items()
+        ]
+        return targets
+
+    def build_plan(self, targets):
+        plan = FetchPlan(targets)
+
+        tiles_by_url = {}
+        for url in plan.listing_urls():
+            try:
+                print(f"\n--- Liste : {url} ---")
+                tiles_by_url[url] = self._listing_tiles(url)
+            except (WebDriverException, CircuitOpenError) as e:
+                self.tracer.error(f"Erreur de navigation ({url}) : {e}", url)
+
+        self._plan_links(plan, tiles_by_url)
+        return plan
+
+    def _plan_links(self, plan, tiles_by_url):
+        for target in plan.targets:
+            kind, concern_key, step, url = target
+            if url in tiles_by_url:
+                _, pattern, _ = self._concern(kind, concern_key)
+                plan.add(target, self._select_links(tiles_by_url[url], pattern, step)[:12])
+
+    def execute_plan(self, plan, on_page=None):
+        # Une seule récupération par page, quel que soit le nombre d'étapes ;
+        # on_page(pages faites, pages prévues, nouveaux produits) est appelé
+        # après chaque page pour suivre la collecte au fil de l'eau
+        found = {target: {} for target in plan.links}
+        total = len(plan.frontier)
+
+        def fetch(link):
+            categories = list(dict.fromkeys(target[3] for target in plan.frontier[link]))
+            return self._page_fields(link, categories)
+
+        pages = self.map_pages(fetch, plan.frontier)
+        for done, (link, fields, error) in enumerate(pages, 1):
+            products = []
+            if error:
+                steps = ", ".join(dict.fromkeys(target[2] for target in plan.frontier[link]))
+                self.tracer.error(f"Erreur produit ({steps}) : {error}", link, steps=steps)
+            else:
+                # Répartition : un Product par étape (catégorie et problème propres)
+                for target in plan.frontier[link]:
+                    kind, concern_key, step, _ = target
+                    concern_name, pattern, _ = self._concern(kind, concern_key)
+                    p = self._product_from_fields(link, fields, concern_name, pattern, step)
+                    if p:
+                        found[target][link] = p
+                        products.append(p)
+            if on_page:
+                on_page(done, total, products)
+
+        # Résultat final dans l'ordre des listes (déterministe)
+        return {
+            target: [found[target][link] for link in links if link in found[target]]
+            for target, links in plan.links.items()
+        }
+
+    def collect(self, targets, on_page=None):
+        with self.tracer.span("plan.build", targets=len(targets)):
+            plan = self.build_plan(targets)
+        print(plan.summary())
+        with self.tracer.span("plan.execute", pages=len(plan.frontier)):
+            return self.execute_plan(plan, on_page)
+
+    # -----------------------------
+    # Re-crawl incrémental
+    # -----------------------------
+    # Chaque liste de catégorie est comparée à sa version précédente
+    # (empreinte des liens, hash de chaque vignette) : seuls les produits
+    # nouveaux ou dont la vignette a changé sont revisités, les autres
+    # sont servis par le cache ; les produits disparus sont marqués retirés.
+    def begin_incremental_refresh(self):
+        self.incremental = True
+        self._synced_listings = set()
+        self._dirty_links = set()
+        self.refresh_stats = dict.fromkeys(
+            ("listings", "listings_unchanged", "pages_fetched", "pages_changed", "pages_reused", "tombstoned"), 0
+        )
+
+    def _sync_listing(self, url, tiles):
+        unchanged, changed, tombstoned = self.cache.sync_listing(url, tiles)
+        self._synced_listings.add(url)
+        self._dirty_links.update(changed)
+        self._count("listings")
+        self._count("tombstoned", tombstoned)
+        if unchanged:
+            self._count("listings_unchanged")
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            if key in self.refresh_stats:
+                self.refresh_stats[key] += n
+
+    # -----------------------------
+    # Variante asynchrone
+    # -----------------------------
+    # Les pages sont récupérées en parallèle dans des threads (session HTTP
+    # keep-alive partagée, drivers du pool pour le secours Selenium) ;
+    # un sémaphore par hôte borne le nombre de requêtes en cours.
+    MAX_IN_FLIGHT_PER_HOST = 4
+
+    async def _aoffload(self, semaphores, url, func, *args):
+        host = urlparse(url).netloc
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.MAX_IN_FLIGHT_PER_HOST)
+
+        async with semaphores[host]:
+            _, result, error = await asyncio.to_thread(self._run_in_pool, lambda _: func(*args), url)
+        if error:
+            raise error
+        return result
+
+    async def _abuild_plan(self, targets, semaphores):
+        plan = FetchPlan(targets)
+
+        async def listing(url):
+            try:
+                return url, await self._aoffload(semaphores, url, self._listing_tiles, url)
+            except (WebDriverException, CircuitOpenError) as e:
+                self.tracer.error(f"Erreur de navigation ({url}) : {e}", url)
+                return url, None
+
+        # Toutes les listes en parallèle, puis même sélection que build_plan
+        listings = await asyncio.gather(*(listing(url) for url in plan.listing_urls()))
+        self._plan_links(plan, {url: tiles for url, tiles in listings if tiles is not None})
+        return plan
+
+    async def aexecute_plan(self, plan, semaphores=None):
+        # Même répartition que execute_plan : chaque page de la frontière
+        # est récupérée une seule fois, les produits sortent dès qu'elle est prête
+        semaphores = {} if semaphores is None else semaphores
+
+        async def fetch(link):
+            categories = list(dict.fromkeys(target[3] for target in plan.frontier[link]))
+            try:
+                return link, await self._aoffload(semaphores, link, self._page_fields, link, categories), None
+            except Exception as e:
+                return link, None, e
+
+        tasks = [asyncio.ensure_future(fetch(link)) for link in plan.frontier]
+        for next_done in asyncio.as_completed(tasks):
+            link, fields, error = await next_done
+            if error:
+                steps = ", ".join(dict.fromkeys(target[2] for target in plan.frontier[link]))
+                self.tracer.error(f"Erreur produit ({steps}) : {error}", link, steps=steps)
                 continue
+            for kind, concern_key, step, _ in plan.frontier[link]:
+                concern_name, pattern, _ = self._concern(kind, concern_key)
+                p = self._product_from_fields(link, fields, concern_name, pattern, step)
+                if p:
+                    yield p
 
-        return all_products
+    async def acollect(self, targets):
+        semaphores = {}
+        plan = await self._abuild_plan(targets, semaphores)
+        print(plan.summary())
+        async for p in self.aexecute_plan(plan, semaphores):
+            yield p
+
+    async def acollect_products_for_routine(self, concern_key):
+        async for p in self.acollect(self.plan_targets(skin_concerns=[concern_key])):
+            yield p
 
 # -----------------------------
-# 5. Interface utilisateur
+# 6. Interface utilisateur
 # -----------------------------
 def ask_user_profile():
     print("Complète ta phrase en choisissant les options :\n")
@@ -387,10 +1298,10 @@ def ask_user_profile():
     return skin_type, concern, budget_max
 
 # -----------------------------
-# 6. Programme principal
+# 7. Programme principal
 # -----------------------------
 def main():
-    scraper = LookfantasticScraper(headless=False)
+    scraper = LookfantasticScraper(headless=False, cache=ProductCache())
 
     try:
         print("=== Assistant Beauté Lookfantastic — Création de routine skincare ===\n")
@@ -407,7 +1318,8 @@ def main():
             print("\nAucun produit trouvé pour ce profil.")
             return
 
-        routine = build_routine(products, concern_key, skin_type, budget_max)
+        with scraper.tracer.span("routine.build", products=len(products)):
+            routine = build_routine(products, concern_key, skin_type, budget_max)
 
         print("\n=== Routine skincare personnalisée ===")
 
@@ -429,133 +1341,464 @@ def main():
                 print(f"\n➡ {label} : (aucun produit trouvé pour cette étape)")
 
     finally:
+        print(f"\n{scraper.timing_report()}")
+        # SCRAPER_TRACE=fichier.jsonl : spans de la session (voir tracing.py)
+        if os.environ.get("SCRAPER_TRACE"):
+            scraper.tracer.export_jsonl(os.environ["SCRAPER_TRACE"])
         input("\nAppuie sur Entrée pour fermer le programme...")
         scraper.close()
 
+# -----------------------------
+# 8. Rafraîchissement du catalogue (tâche de fond)
+# -----------------------------
+# Parcourt tous les problèmes peau et cheveux et publie un catalogue
+# complet ; l'application sert ensuite les routines depuis ce catalogue
+# sans lancer Chrome.
+def refresh_catalog(scraper, store):
+    # Un seul plan pour la peau et les cheveux : chaque page est visitée une fois
+    data = {
+        "skin": {concern_key: [] for concern_key in scraper.CONCERNS},
+        "hair": {concern_key: [] for concern_key in scraper.HAIR_CONCERNS}
+    }
+
+    targets = scraper.plan_targets(skin_concerns=scraper.CONCERNS, hair_concerns=scraper.HAIR_CONCERNS)
+    for (kind, concern_key, _, _), products in scraper.collect(targets).items():
+        data[kind][concern_key].extend(p.to_dict() for p in products)
+
+    return store.publish(data)
+
+# En mode incrémental, une page dont la vignette n'a pas changé est tout de
+# même revisitée au-delà de ce délai (filet de sécurité)
+REVALIDATE_AFTER = 7 * 24 * 3600
+
+def run_refresher(catalog_dir=DEFAULT_CATALOG_DIR, interval=6 * 3600, workers=2, once=False, incremental=True,
+                  trace_path=None, archive_path=None):
+    store = CatalogStore(catalog_dir)
+    # Mode complet : les pages vues au cycle précédent sont périmées, celles
+    # partagées entre étapes d'un même cycle sont réutilisées
+    ttl = REVALIDATE_AFTER if incremental else interval / 2
+    archive = SnapshotArchive(archive_path) if archive_path else None
+    scraper = LookfantasticScraper(headless=True, cache=ProductCache(ttl=ttl), workers=workers, archive=archive)
+
+    try:
+        while True:
+            start = time.time()
+            try:
+                if incremental:
+                    scraper.begin_incremental_refresh()
+                version = refresh_catalog(scraper, store)
+                if version:
+                    print(f"Catalogue {version} publié en {time.time() - start:.0f}s")
+                else:
+                    print("Aucun produit récupéré : catalogue précédent conservé")
+                if incremental:
+                    print("Re-crawl incrémental : " + ", ".join(f"{k}={v}" for k, v in scraper.refresh_stats.items()))
+            except WebDriverException as e:
+                scraper.tracer.error(f"Erreur de rafraîchissement : {e}")
+
+            # Entrées périmées et pages retirées : le cache ne grossit pas sans fin
+            scraper.cache.purge_expired()
+
+            # Spans du passage ajoutés au fichier de trace, puis oubliés
+            if trace_path:
+                scraper.tracer.export_jsonl(trace_path)
+                scraper.tracer.clear()
+
+            if once:
+                break
+            time.sleep(max(0.0, interval - (time.time() - start)))
+    finally:
+        scraper.close()
+        if archive:
+            archive.close()
+
+def refresher_main(argv=None):
+    parser = argparse.ArgumentParser(description="Rafraîchit le catalogue local des produits.")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_DIR, help="dossier du catalogue")
+    parser.add_argument("--interval", type=float, default=6 * 3600, help="secondes entre deux passages")
+    parser.add_argument("--workers", type=int, default=2, help="navigateurs en parallèle")
+    parser.add_argument("--once", action="store_true", help="un seul passage puis arrêt")
+    parser.add_argument("--full", action="store_true", help="re-scraper toutes les pages (pas d'incrémental)")
+    parser.add_argument("--trace", help="fichier JSON lines où ajouter les spans de chaque passage")
+    parser.add_argument("--archive", nargs="?", const=DEFAULT_ARCHIVE_PATH,
+                        help="archiver les pages récupérées (rejeu : python scraper.py replay)")
+    args = parser.parse_args(argv)
+
+    run_refresher(args.catalog, args.interval, args.workers, args.once, incremental=not args.full, trace_path=args.trace,
+                  archive_path=args.archive)
+
+
+# -----------------------------
+# 9. Crawl distribué (plusieurs processus)
+# -----------------------------
+# Les listes puis les pages produits passent par une frontière SQLite
+# partagée (frontier.py) : chaque processus a son propre navigateur, prend
+# des tâches sous bail et écrit les produits dans la même base.
+def seed_frontier(frontier, scraper, skin_concerns=(), hair_concerns=()):
+    by_listing = {}
+    for kind, concern_key, step, url in scraper.plan_targets(skin_concerns, hair_concerns):
+        by_listing.setdefault(url, []).append((kind, concern_key, step))
+    for url, targets in by_listing.items():
+        frontier.enqueue_listing(url, targets)
+    return len(by_listing)
+
+def frontier_products(scraper, link, fields, targets):
+    # Lignes (kind, concern_key, step, url, position, produit) pour la frontière
+    rows = []
+    for kind, concern_key, step, position in targets:
+        concern_name, pattern, _ = scraper._concern(kind, concern_key)
+        p = scraper._product_from_fields(link, fields, concern_name, pattern, step)
+        if p:
+            rows.append((kind, concern_key, step, link, position, p.to_dict()))
+    return rows
+
+def crawl_worker(frontier, scraper, worker_id=None, poll=1.0):
+    # Tourne jusqu'à ce que la frontière soit vide ; un bail expiré d'un
+    # autre worker (planté) est repris au passage
+    worker_id = worker_id or default_worker_id()
+    build = lambda link: lambda fields, targets: frontier_products(scraper, link, fields, targets)
+    done = 0
+
+    while True:
+        tasks = frontier.lease(worker_id)
+        if not tasks:
+            if not frontier.remaining():
+                return done
+            time.sleep(poll)
+            continue
+
+        for task in tasks:
+            url = task["url"]
+            try:
+                if task["kind"] == "listing":
+                    tiles = scraper._listing_tiles(url)
+                    for kind, concern_key, step in task["targets"]:
+                        _, pattern, _ = scraper._concern(kind, concern_key)
+                        links = scraper._select_links(tiles, pattern, step)[:12]
+                        for position, link in enumerate(links):
+                            frontier.add_target(link, (kind, concern_key, step, position), build(link))
+                    frontier.ack(url, worker_id)
+                else:
+                    fields = scraper._page_fields(url)
+                    frontier.complete_product(url, worker_id, fields, build(url))
+                done += 1
+            except Exception as e:
+                scraper.tracer.error(f"Erreur tâche {task['kind']} ({url}) : {e}", url, attempts=task["attempts"])
+                frontier.nack(url, worker_id, str(e))
+
+def publish_from_frontier(frontier, store, skin_concerns=(), hair_concerns=()):
+    data = {
+        "skin": {concern_key: frontier.products("skin", concern_key) for concern_key in skin_concerns},
+        "hair": {concern_key: frontier.products("hair", concern_key) for concern_key in hair_concerns}
+    }
+    return store.publish(data)
+
+def _crawl_process(frontier_path, lease_ttl, rate):
+    # Point d'entrée d'un processus worker : son navigateur, son débit
+    frontier = CrawlFrontier(frontier_path, lease_ttl=lease_ttl)
+    scraper = LookfantasticScraper(headless=True, cache=ProductCache(), scheduler=HostScheduler(max_rate=rate))
+    try:
+        done = crawl_worker(frontier, scraper)
+        print(f"Worker {os.getpid()} : {done} tâches traitées")
+    finally:
+        scraper.close()
+        frontier.close()
+
+def crawl_main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl partagé entre plusieurs processus.")
+    parser.add_argument("--frontier", default=DEFAULT_FRONTIER_PATH, help="base SQLite de la frontière")
+    parser.add_argument("--processes", type=int, default=2, help="processus workers (un navigateur chacun)")
+    parser.add_argument("--seed", action="store_true", help="vider la frontière et y placer toutes les listes")
+    parser.add_argument("--lease", type=float, default=300, help="durée d'un bail (secondes)")
+    parser.add_argument("--rate", type=float, default=1.0, help="requêtes / seconde / hôte pour chaque worker")
+    parser.add_argument("--publish", action="store_true", help="publier le catalogue une fois la frontière vide")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_DIR, help="dossier du catalogue")
+    args = parser.parse_args(argv)
+
+    skin_concerns = list(LookfantasticScraper.CONCERNS)
+    hair_concerns = list(LookfantasticScraper.HAIR_CONCERNS)
+    frontier = CrawlFrontier(args.frontier, lease_ttl=args.lease)
+    try:
+        if args.seed:
+            frontier.reset()
+            seeded = seed_frontier(frontier, LookfantasticScraper(backend="selenium"), skin_concerns, hair_concerns)
+            print(f"{seeded} listes placées dans la frontière")
+
+        # Workers lancés sur d'autres machines : même commande sans --seed,
+        # avec une base partagée
+        workers = [
+            multiprocessing.Process(target=_crawl_process, args=(args.frontier, args.lease, args.rate))
+            for _ in range(max(1, args.processes))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        print(f"Frontière : {frontier.stats()}")
+
+        if args.publish:
+            version = publish_from_frontier(frontier, CatalogStore(args.catalog), skin_concerns, hair_concerns)
+            print(f"Catalogue {version} publié" if version else "Frontière sans produit : catalogue précédent conservé")
+    finally:
+        frontier.close()
+
+# -----------------------------
+# 10. Mode batch (profils en masse)
+# -----------------------------
+# Fichier JSON lines, un profil par ligne :
+#   {"id": "u1", "kind": "skin", "type": "2", "concern": "1", "budget": 25}
+#   {"id": "u2", "kind": "hair", "type": "3", "concern": "2", "budget": null}
+# Chaque problème distinct n'est collecté qu'une fois (un seul plan pour
+# la peau et les cheveux), puis tous les profils sont servis par l'index
+# de scores ; un même (problème, type, budget) n'est calculé qu'une fois.
+def read_profiles(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def check_profile(profile):
+    kind = profile.get("kind")
+    if kind == "skin":
+        concerns, types = LookfantasticScraper.CONCERNS, SKIN_TYPE_RULES
+    elif kind == "hair":
+        concerns, types = LookfantasticScraper.HAIR_CONCERNS, HAIR_TYPE_RULES
+    else:
+        return f"kind inconnu : {kind!r}"
+    if str(profile.get("concern")) not in concerns:
+        return f"problème inconnu : {profile.get('concern')!r}"
+    if str(profile.get("type")) not in types:
+        return f"type inconnu : {profile.get('type')!r}"
+    budget = profile.get("budget")
+    if budget is not None and (isinstance(budget, bool) or not isinstance(budget, (int, float))
+                               or not 0 <= budget < float("inf")):
+        return f"budget invalide : {budget!r}"
+    return None
+
+def collect_for_profiles(scraper, profiles, catalog=None):
+    # Produits par (kind, concern_key) : catalogue publié s'il couvre le
+    # problème, sinon un seul crawl pour tous les problèmes manquants
+    products = {}
+    missing = {"skin": [], "hair": []}
+    for kind, concern_key in dict.fromkeys((p["kind"], str(p["concern"])) for p in profiles):
+        data = catalog.products(kind, concern_key) if catalog else None
+        if data is None:
+            missing[kind].append(concern_key)
+        else:
+            products[kind, concern_key] = [Product.from_dict(d) for d in data]
+
+    if missing["skin"] or missing["hair"]:
+        for key in [("skin", c) for c in missing["skin"]] + [("hair", c) for c in missing["hair"]]:
+            products[key] = []
+        targets = scraper.plan_targets(skin_concerns=missing["skin"], hair_concerns=missing["hair"])
+        for (kind, concern_key, _, _), found in scraper.collect(targets).items():
+            products[kind, concern_key].extend(found)
+    return products
+
+def run_batch(scraper, profiles, output, catalog=None):
+    valid = [p for p in profiles if check_profile(p) is None]
+    products = collect_for_profiles(scraper, valid, catalog)
+
+    with scraper.tracer.span("scoring", products=sum(len(found) for found in products.values())):
+        indexes = {
+            key: build_skin_index(found) if key[0] == "skin" else build_hair_index(found)
+            for key, found in products.items()
+        }
+
+    routines = {}
+    written = 0
+    with open(output, "w", encoding="utf-8") as f:
+        for profile in profiles:
+            error = check_profile(profile)
+            if error:
+                scraper.tracer.error(f"Profil ignoré ({profile.get('id')}) : {error}")
+                line = {"id": profile.get("id"), "error": error}
+            else:
+                kind, concern_key, type_key = profile["kind"], str(profile["concern"]), str(profile["type"])
+                budget = profile.get("budget")
+                key = (kind, concern_key, type_key, budget)
+                if key not in routines:
+                    routine = indexes[kind, concern_key].routine(concern_key, type_key, budget)
+                    routines[key] = {step: p.to_dict() for step, p in routine.items()}
+                line = {
+                    "id": profile.get("id"), "kind": kind, "concern": concern_key,
+                    "type": type_key, "budget": budget, "routine": routines[key]
+                }
+                written += 1
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return written
+
+def batch_main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcule les routines d'un fichier de profils (JSON lines).")
+    parser.add_argument("profiles", help="fichier de profils (JSON lines)")
+    parser.add_argument("--output", default="routines.jsonl", help="fichier de routines (JSON lines)")
+    parser.add_argument("--workers", type=int, default=2, help="navigateurs en parallèle pour le crawl")
+    parser.add_argument("--catalog", help="catalogue publié à utiliser avant de crawler")
+    args = parser.parse_args(argv)
+
+    profiles = read_profiles(args.profiles)
+    catalog = CatalogStore(args.catalog) if args.catalog else None
+    scraper = LookfantasticScraper(headless=True, cache=ProductCache(), workers=args.workers)
+    try:
+        start = time.time()
+        written = run_batch(scraper, profiles, args.output, catalog)
+        print(f"{written}/{len(profiles)} routines écrites dans {args.output} en {time.time() - start:.0f}s")
+    finally:
+        print(scraper.timing_report())
+        scraper.close()
+
+
+# -----------------------------
+# 11. Rejeu de l'archive des pages
+# -----------------------------
+# Le catalogue est reconstruit depuis la dernière version archivée de
+# chaque page (archive.py) : extraction, catégories, filtres des problèmes
+# et troncature relancés avec le code actuel, sans navigateur ni réseau.
+class ReplayScraper(LookfantasticScraper):
+    def __init__(self, archive, tracer=None):
+        tracer = tracer or Tracer()
+        super().__init__(headless=True, backend=ArchiveReplay(archive, tracer), offline=True, tracer=tracer)
+
+    # Aucun repli navigateur : une page absente de l'archive est une erreur
+    def _selenium_listing(self, url):
+        raise WebDriverException(f"Page absente de l'archive ({url})")
+
+    def _selenium_product_fields(self, link):
+        raise WebDriverException(f"Page absente de l'archive ({link})")
+
+def replay_main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconstruit le catalogue depuis l'archive des pages.")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH, help="archive des pages (.warc.gz)")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_DIR, help="dossier du catalogue")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.archive + ".idx"):
+        sys.exit(f"Archive introuvable : {args.archive}")
+    archive = SnapshotArchive(args.archive)
+    scraper = ReplayScraper(archive)
+    try:
+        start = time.time()
+        version = refresh_catalog(scraper, CatalogStore(args.catalog))
+        if version:
+            print(f"Catalogue {version} reconstruit depuis {args.archive} en {time.time() - start:.1f}s")
+        else:
+            print(f"Aucun produit dans {args.archive} : catalogue précédent conservé")
+        print(f"Archive : {archive.stats()}")
+    finally:
+        scraper.close()
+        archive.close()
+
 
 # ============================================================
 # ---------------   MODULE CHEVEUX (COMPLET)   ---------------
 # ============================================================
 
 # 1. Détection catégorie cheveux
-def detect_hair_category(name: str, description: str) -> str:
-    text = (name + " " + description).lower()
+HAIR_CATEGORY_RULES = [
+    ("shampoo", ("shampoo", "shampoing", "cleanser", "scalp wash")),
+    ("conditioner", ("conditioner", "après-shampoing", "conditionneur")),
+    ("mask", ("mask", "masque", "deep treatment", "repair mask")),
+    ("hair_serum", ("oil", "huile", "serum", "sérum capillaire", "hair oil")),
+    ("leave_in", ("leave-in", "sans rinçage")),
+]
 
-    if any(k in text for k in ["shampoo", "shampoing", "cleanser", "scalp wash"]):
-        return "shampoo"
-    if any(k in text for k in ["conditioner", "après-shampoing", "conditionneur"]):
-        return "conditioner"
-    if any(k in text for k in ["mask", "masque", "deep treatment", "repair mask"]):
-        return "mask"
-    if any(k in text for k in ["oil", "huile", "serum", "sérum capillaire", "hair oil"]):
-        return "hair_serum"
-    if any(k in text for k in ["leave-in", "sans rinçage"]):
-        return "leave_in"
-    return "other_hair"
+def detect_hair_category(name: str, description: str) -> str:
+    hits = KEYWORDS.hits(name + " " + description)
+    return category_from_hits(hits, HAIR_CATEGORY_RULES, "other_hair")
 
 
 # 2. Scoring cheveux (version élargie)
-def score_hair_product(product: Product, concern_key: str, hair_type_key: str, budget_max: float | None) -> int:
-    text = (product.name + " " + product.description).lower()
-    score = 0
-
-    # -------------------------
-    # PROBLÈMES PRINCIPAUX
-    # -------------------------
 
+# -------------------------
+# PROBLÈMES PRINCIPAUX
+# -------------------------
+HAIR_CONCERN_RULES = {
     # Cheveux secs → hydratation, nutrition, réparation
-    if concern_key == "1":
-        if any(k in text for k in [
+    "1": [
+        ((
             "hydrating", "hydration", "moisture", "moisturizing",
             "nourrissant", "nourishing", "nutrition",
             "repair", "réparateur", "damage", "damaged",
             "dry hair", "cheveux secs",
             "butter", "beurre", "shea", "karité",
             "rich", "intense", "deep conditioning"
-        ]):
-            score += 4
-        if any(k in text for k in ["oil", "huile", "argan", "coconut", "coco"]):
-            score += 3
-
+        ), 4),
+        (("oil", "huile", "argan", "coconut", "coco"), 3),
+    ],
     # Cheveux gras → purification, séborégulation
-    elif concern_key == "2":
-        if any(k in text for k in [
+    "2": [
+        ((
             "purifying", "purifiant", "clarifying", "clarifiant",
             "seboregulating", "séborégulateur",
             "oily hair", "cheveux gras",
             "fresh", "fraîcheur", "detox", "détox",
             "scalp balance", "équilibrant"
-        ]):
-            score += 4
-        if any(k in text for k in ["mint", "menthe", "tea tree"]):
-            score += 3
-
+        ), 4),
+        (("mint", "menthe", "tea tree"), 3),
+    ],
     # Chute / densité → fortifiant, croissance
-    elif concern_key == "3":
-        if any(k in text for k in [
+    "3": [
+        ((
             "hair loss", "chute", "anti-chute",
             "densifying", "densité", "density",
             "growth", "croissance", "stimulating", "stimulant",
             "fortifying", "strengthening", "strength",
             "biotin", "caffeine", "caféine", "keratin", "kératine"
-        ]):
-            score += 4
-        if any(k in text for k in ["volume", "volumizing", "volumateur"]):
-            score += 3
-
-    # -------------------------
-    # TYPES DE CHEVEUX
-    # -------------------------
+        ), 4),
+        (("volume", "volumizing", "volumateur"), 3),
+    ],
+}
 
+# -------------------------
+# TYPES DE CHEVEUX
+# -------------------------
+HAIR_TYPE_RULES = {
     # Fins → volume, légèreté
-    if hair_type_key == "1":
-        if any(k in text for k in [
+    "1": [
+        ((
             "volume", "volumizing", "volumateur",
             "lightweight", "léger", "fine hair"
-        ]):
-            score += 3
-
+        ), 3),
+    ],
     # Épais → discipline, anti-frizz
-    elif hair_type_key == "2":
-        if any(k in text for k in [
+    "2": [
+        ((
             "smoothing", "lissant", "discipline",
             "anti-frizz", "anti-frisottis",
             "thick hair", "cheveux épais"
-        ]):
-            score += 3
-
+        ), 3),
+    ],
     # Bouclés → définition, hydratation
-    elif hair_type_key == "3":
-        if any(k in text for k in [
+    "3": [
+        ((
             "curl", "boucles", "curly",
             "definition", "définition",
             "hydrating", "moisture",
             "anti-frizz", "anti-frisottis"
-        ]):
-            score += 3
-
+        ), 3),
+    ],
     # Crépus → nutrition intense, beurres, huiles
-    elif hair_type_key == "4":
-        if any(k in text for k in [
+    "4": [
+        ((
             "rich", "ultra nourishing", "ultra-nourrissant",
             "beurre", "butter", "karité", "shea",
             "deep conditioning", "intense repair",
             "coily", "kinky", "afro"
-        ]):
-            score += 3
+        ), 3),
+    ],
+}
+
+def score_hair_product(product: Product, concern_key: str, hair_type_key: str, budget_max: float | None) -> int:
+    hits = product_hits(product)
+    score = rules_score(hits, HAIR_CONCERN_RULES.get(concern_key, ()))
+    score += rules_score(hits, HAIR_TYPE_RULES.get(hair_type_key, ()))
 
     # -------------------------
     # BUDGET
     # -------------------------
-    if budget_max is not None:
-        try:
-            price_num = float(product.price.replace("€", "").replace(",", ".").strip())
-            if price_num <= budget_max:
-                score += 2
-            else:
-                score -= 2
-        except ValueError:
-            pass
+    if budget_max is not None and product.price_cents is not None:
+        if product.price_cents <= budget_max * 100:
+            score += 2
+        else:
+            score -= 2
 
     return score
 
@@ -596,14 +1839,7 @@ def build_hair_routine(products, concern_key, hair_type_key, budget_max):
     # Ajout de produits par défaut si nécessaire
     for step in routine:
         if routine[step] is None:
-            routine[step] = Product(
-                name="Produit recommandé par défaut",
-                price="9,99 €",
-                description="Produit générique ajouté automatiquement pour compléter la routine.",
-                url="https://www.lookfantastic.fr",
-                category=step,
-                concern=concern_label
-            )
+            routine[step] = default_product(step, concern_label)
 
     return routine
 
@@ -623,36 +1859,221 @@ LookfantasticScraper.HAIR_CATEGORY_URLS = {
 
 
 # 5. Scraper cheveux
-def collect_hair_products(self, concern_key):
-    all_products = []
+def collect_hair_products(self, concern_key, on_page=None):
+    results = self.collect(self.plan_targets(hair_concerns=[concern_key]), on_page)
+    return [p for products in results.values() for p in products]
 
-    for step, url in self.HAIR_CATEGORY_URLS.items():
-        try:
-            print(f"\n--- Étape cheveux {step} : {url} ---")
-            concern_name, pattern, links = self._scrape_category(url, concern_key)
+async def acollect_hair_products(self, concern_key):
+    async for p in self.acollect(self.plan_targets(hair_concerns=[concern_key])):
+        yield p
+
+# On attache les méthodes à la classe
+LookfantasticScraper.collect_hair_products = collect_hair_products
+LookfantasticScraper.acollect_hair_products = acollect_hair_products
+
+# 6. Compilation de tous les mots-clés (skincare + cheveux)
+KEYWORDS = KeywordMatcher(
+    [word for _, words in SKIN_CATEGORY_RULES + HAIR_CATEGORY_RULES for word in words]
+    + rule_keywords(SKIN_CONCERN_RULES, SKIN_TYPE_RULES, HAIR_CONCERN_RULES, HAIR_TYPE_RULES)
+)
 
-            if not links:
+
+# ============================================================
+# ---------------   INDEX DE SCORING (NUMPY)   ---------------
+# ============================================================
+# Le catalogue est transformé une fois en matrice produits × règles
+# (mots-clés trouvés) et en vecteur de prix. Les scores de tous les
+# profils (problème × type) sont calculés en un seul produit matriciel ;
+# le budget est appliqué au moment de la requête sous forme de masque et
+# chaque étape de la routine se réduit à un argmax.
+
+class RoutineIndex:
+    def __init__(self, products, concern_rules, type_rules, steps, concerns):
+        self.products = list(products)
+        self.steps = tuple(steps)
+        self.concerns = concerns
+
+        # Une règle = (problème ou type, clé, mots-clés, points)
+        self._rules = []
+        for key, entries in concern_rules.items():
+            self._rules += [("concern", key, words, points) for words, points in entries]
+        for key, entries in type_rules.items():
+            self._rules += [("type", key, words, points) for words, points in entries]
+
+        # Matrice produits × mots-clés, puis règles déclenchées (au moins un mot)
+        vocabulary = {word: i for i, word in enumerate(sorted({w for r in self._rules for w in r[2]}))}
+        rows, cols = [], []
+        for i, product in enumerate(self.products):
+            for word in product_hits(product):
+                if word in vocabulary:
+                    rows.append(i)
+                    cols.append(vocabulary[word])
+        keyword_matrix = np.zeros((len(self.products), len(vocabulary)), dtype=np.int32)
+        keyword_matrix[rows, cols] = 1
+
+        rule_words = np.zeros((len(vocabulary), len(self._rules)), dtype=np.int32)
+        for r, (_, _, words, _) in enumerate(self._rules):
+            rule_words[[vocabulary[w] for w in words], r] = 1
+        self._features = (keyword_matrix @ rule_words > 0).astype(np.int32)
+
+        # Scores de tous les profils, hors budget : (produits × profils)
+        self.profiles = [(c, t) for c in concern_rules for t in type_rules]
+        self._columns = {profile: i for i, profile in enumerate(self.profiles)}
+        weights = np.stack([self._weights(c, t) for c, t in self.profiles], axis=1)
+        self.scores = self._features @ weights
+
+        # Produits regroupés par étape de la routine
+        prices = np.array(
+            [np.nan if p.price_cents is None else p.price_cents for p in self.products], dtype=np.float64
+        )
+        categories = np.array([p.category for p in self.products], dtype=object)
+        self._step_rows = {}
+        self._step_prices = {}
+        for step in self.steps:
+            step_rows = np.flatnonzero(categories == step)
+            self._step_rows[step] = step_rows
+            self._step_prices[step] = prices[step_rows]
+
+    def _weights(self, concern_key, type_key):
+        return np.array([
+            points if (kind == "concern" and key == concern_key) or (kind == "type" and key == type_key) else 0
+            for kind, key, _, points in self._rules
+        ], dtype=np.int32)
+
+    def _step_scores(self, step, concern_key, type_key):
+        step_rows = self._step_rows[step]
+        col = self._columns.get((concern_key, type_key))
+        if col is not None:
+            return self.scores[step_rows, col]
+        # Profil hors des règles (clé inconnue) : calcul à la demande
+        return self._features[step_rows] @ self._weights(concern_key, type_key)
+
+    def routine(self, concern_key, type_key, budget_max):
+        concern_label = self.concerns.get(concern_key, ("Inconnu", "", ""))[0]
+        routine = {}
+        for step in self.steps:
+            step_rows = self._step_rows[step]
+            if not len(step_rows):
+                routine[step] = default_product(step, concern_label)
                 continue
 
-            for link in links[:12]:
-                try:
-                    p = self._scrape_product_page(
-                        link,
-                        concern_name,
-                        pattern,
-                        forced_category=step
-                    )
-                    if p:
-                        all_products.append(p)
-                except Exception as e:
-                    print(f"Erreur produit ({step}) : {e}")
-                    continue
+            scores = self._step_scores(step, concern_key, type_key)
+            if budget_max is not None:
+                prices = self._step_prices[step]
+                limit = budget_max * 100
+                # Prix illisible (NaN) : ni bonus ni malus
+                scores = scores + np.where(prices <= limit, 2, np.where(prices > limit, -2, 0))
 
-        except WebDriverException as e:
-            print(f"Erreur de navigation ({step}) : {e}")
-            continue
+            # argmax renvoie le premier maximum : même choix que le tri stable
+            routine[step] = self.products[step_rows[int(np.argmax(scores))]]
+        return routine
 
-    return all_products
 
-# On attache la méthode à la classe
-LookfantasticScraper.collect_hair_products = collect_hair_products
\ No newline at end of file
+def build_skin_index(products):
+    return RoutineIndex(
+        products, SKIN_CONCERN_RULES, SKIN_TYPE_RULES,
+        ("cleanser", "serum", "moisturizer", "spf"), LookfantasticScraper.CONCERNS
+    )
+
+
+def build_hair_index(products):
+    return RoutineIndex(
+        products, HAIR_CONCERN_RULES, HAIR_TYPE_RULES,
+        ("shampoo", "conditioner", "mask", "hair_serum"), LookfantasticScraper.HAIR_CONCERNS
+    )
+
+
+# ============================================================
+# ---------------   RESSOURCES PARTAGÉES   ---------------
+# ============================================================
+
+# 1. Pool de scrapers partagé entre les sessions (Streamlit)
+class ScraperPool:
+    def __init__(self, factory=None, size=2, warm=True):
+        self.factory = factory or (lambda: LookfantasticScraper(headless=True))
+        self.size = size
+        self.warm = warm
+        self._idle = queue.Queue()
+
+        # Instances pré-lancées au démarrage de l'application
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        scraper = self.factory()
+        if self.warm:
+            # Toute erreur (Chrome absent, téléchargement du driver bloqué…) :
+            # l'instance reste utilisable, son navigateur sera lancé à la demande
+            try:
+                scraper.warm_up()
+            except Exception as e:
+                scraper.tracer.error(f"Erreur de préchauffage : {e}")
+        return scraper
+
+    def _discard(self, scraper):
+        try:
+            scraper.close()
+        except Exception:
+            pass
+
+    def _replace(self, scraper):
+        # La place du pool est toujours rendue, même si la fermeture échoue
+        try:
+            self._discard(scraper)
+        finally:
+            self._idle.put(self._spawn())
+
+    def lease(self, timeout=None):
+        try:
+            scraper = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Aucun scraper libre après {timeout:g}s")
+        if not scraper.is_alive():
+            # Driver planté : on le remplace avant de le prêter
+            self._discard(scraper)
+            scraper = self._spawn()
+        return scraper
+
+    def give_back(self, scraper, broken=False):
+        if broken or not scraper.is_alive():
+            # Remplacement en arrière-plan pour garder une instance prête
+            threading.Thread(target=self._replace, args=(scraper,), daemon=True).start()
+        else:
+            self._idle.put(scraper)
+
+    @contextmanager
+    def leased(self, timeout=None):
+        scraper = self.lease(timeout)
+        broken = False
+        try:
+            yield scraper
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.give_back(scraper, broken)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+if __name__ == "__main__":
+    # python scraper.py          → assistant interactif
+    # python scraper.py refresh  → rafraîchisseur du catalogue
+    # python scraper.py crawl    → crawl partagé entre plusieurs processus
+    # python scraper.py batch    → routines d'un fichier de profils
+    # python scraper.py replay   → catalogue reconstruit depuis l'archive des pages
+    if len(sys.argv) > 1 and sys.argv[1] == "refresh":
+        refresher_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "crawl":
+        crawl_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "replay":
+        replay_main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,29 @@
+import sqlite3
+from contextlib import contextmanager
+
+# ============================================================
+# ---------------   BASES SQLITE PARTAGÉES ENTRE PROCESSUS   ---------------
+# ============================================================
+# Frontière de crawl (frontier.py) et index de l'archive (archive.py) sont
+# écrits par plusieurs processus à la fois : mode WAL, et chaque écriture
+# prend le verrou d'écriture de la base dès le début de sa transaction.
+
+
+def connect_shared(path):
+    # isolation_level=None : transactions explicites (BEGIN IMMEDIATE)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+@contextmanager
+def immediate_transaction(conn, lock):
+    # lock : threads du processus ; BEGIN IMMEDIATE : autres processus
+    with lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
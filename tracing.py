@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ============================================================
+# ---------------   TRACES PAR ÉTAPE DU SCRAPING   ---------------
+# ============================================================
+# Chaque étape du pipeline (lancement du driver, navigation, cookies,
+# attente d'un sélecteur, extraction, scoring, construction de routine)
+# est enregistrée comme un « span » : nom, URL, durée, parent, statut.
+# Les erreurs passent par le même canal (affichées comme avant avec
+# print, et gardées dans la trace). Export en JSON lines ou au format
+# OTLP/JSON d'OpenTelemetry.
+
+SERVICE_NAME = "beauty-assistant"
+
+
+def _new_id(size):
+    return os.urandom(size).hex()
+
+
+class Tracer:
+    def __init__(self, max_spans=5000, echo=True):
+        self.echo = echo  # affiche les erreurs dans la console
+        self.trace_id = _new_id(16)
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    # -----------------------------
+    # Enregistrement
+    # -----------------------------
+    @contextmanager
+    def span(self, name, url=None, **attributes):
+        stack = self._stack()
+        span = {
+            "trace_id": self.trace_id,
+            "span_id": _new_id(8),
+            "parent_id": stack[-1]["span_id"] if stack else None,
+            "name": name,
+            "url": url,
+            "start": time.time(),
+            "duration_ms": None,
+            "status": "ok",
+            "attributes": attributes,
+            "thread": threading.current_thread().name
+        }
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span["attributes"]
+        except BaseException as e:
+            span["status"] = "error"
+            span["attributes"]["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            stack.pop()
+            self._record(span)
+
+    def error(self, message, url=None, **attributes):
+        # Remplace les print() d'erreur : même message, gardé dans la trace
+        stack = self._stack()
+        self._record({
+            "trace_id": self.trace_id,
+            "span_id": _new_id(8),
+            "parent_id": stack[-1]["span_id"] if stack else None,
+            "name": "error",
+            "url": url,
+            "start": time.time(),
+            "duration_ms": 0.0,
+            "status": "error",
+            "attributes": dict(attributes, message=message),
+            "thread": threading.current_thread().name
+        })
+        if self.echo:
+            print(message)
+
+    # -----------------------------
+    # Lecture / export
+    # -----------------------------
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def errors(self):
+        return [span for span in self.spans() if span["status"] == "error"]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def summary(self):
+        # Par nom de span : nombre, erreurs, total / moyenne / maximum (ms)
+        stats = {}
+        for span in self.spans():
+            if span["name"] == "error":
+                continue
+            s = stats.setdefault(span["name"], {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["count"] += 1
+            s["errors"] += span["status"] == "error"
+            s["total_ms"] += span["duration_ms"]
+            s["max_ms"] = max(s["max_ms"], span["duration_ms"])
+        for s in stats.values():
+            s["mean_ms"] = round(s["total_ms"] / s["count"], 3)
+            s["total_ms"] = round(s["total_ms"], 3)
+        return dict(sorted(stats.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+    def to_jsonl(self):
+        return "".join(json.dumps(span, ensure_ascii=False) + "\n" for span in self.spans())
+
+    def export_jsonl(self, path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(self.to_jsonl())
+
+    def to_otlp(self):
+        # Format OTLP/JSON (ExportTraceServiceRequest) lisible par un collecteur
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        otlp_spans = []
+        for span in self.spans():
+            start_ns = int(span["start"] * 1e9)
+            attributes = dict(span["attributes"], **{"thread.name": span["thread"]})
+            if span["url"]:
+                attributes["url.full"] = span["url"]
+            otlp_span = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(span["duration_ms"] * 1e6)),
+                "attributes": [attribute(k, v) for k, v in attributes.items()],
+                "status": {"code": 2 if span["status"] == "error" else 1}
+            }
+            if span["parent_id"]:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            otlp_spans.append(otlp_span)
+
+        return {"resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": otlp_spans}]
+        }]}
+
+    def export_otlp(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_otlp(), f, ensure_ascii=False)